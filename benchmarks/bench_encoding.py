@@ -0,0 +1,85 @@
+"""compare the encoding presets of the postprocessed yearly files
+
+Writes one year of a monthly f09 variable (smooth field plus noise, like
+e.g. TSA) with every preset and measures the write time, the file size
+and the time to read the whole file, a time series at one grid point and
+a single map.
+
+Usage: python -m benchmarks.bench_encoding
+"""
+
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import xarray as xr
+
+from cesm._load.encoding import ENCODING_PRESETS, _encoding
+
+nlat, nlon, ntime = 192, 288, 12
+
+
+def dataset():
+    """one year of a monthly variable"""
+
+    rng = np.random.default_rng(0)
+
+    lat = np.linspace(-90, 90, nlat)
+    lon = np.arange(nlon) * 360 / nlon
+
+    field = 250 + 50 * np.cos(np.deg2rad(lat))[:, np.newaxis] * np.ones(nlon)
+    data = field + rng.normal(scale=2, size=(ntime, nlat, nlon))
+
+    time = xr.DataArray(
+        np.arange(ntime) * 30.0 + 15,
+        dims="time",
+        attrs={"units": "days since 2000-01-01", "calendar": "noleap"},
+    )
+
+    return xr.Dataset(
+        {"TSA": (("time", "lat", "lon"), data)},
+        coords={"time": time, "lat": lat, "lon": lon},
+    )
+
+
+def read(fN, **indexers):
+    with xr.open_dataset(fN) as ds:
+        return ds.TSA.isel(**indexers).load()
+
+
+def main():
+
+    ds = dataset()
+
+    header = "{:>11} {:>10} {:>10} {:>9} {:>16} {:>9}"
+    print(
+        header.format(
+            "preset", "write [s]", "size [MB]", "read [s]", "timeseries [s]", "map [s]"
+        )
+    )
+
+    with tempfile.TemporaryDirectory() as folder:
+        for preset in ENCODING_PRESETS:
+            fN = os.path.join(folder, f"{preset}.nc")
+
+            def write():
+                ds.to_netcdf(
+                    fN, format="NETCDF4_CLASSIC", encoding=_encoding(ds, preset)
+                )
+
+            t_write = timeit.timeit(write, number=3) / 3
+            size = os.path.getsize(fN) / 1e6
+
+            t_read = timeit.timeit(lambda: read(fN), number=5) / 5
+            t_ts = timeit.timeit(lambda: read(fN, lat=100, lon=100), number=20) / 20
+            t_map = timeit.timeit(lambda: read(fN, time=6), number=20) / 20
+
+            print(
+                f"{preset:>11} {t_write:>10.3f} {size:>10.2f} {t_read:>9.4f} "
+                f"{t_ts:>16.5f} {t_map:>9.5f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""interpolate a multi-year 3D CAM field from hybrid to pressure levels
+
+Compares the vectorized interpolation of _data_atm.interp_to_pressure
+(numpy and dask-chunked over time) with a loop over the columns using
+np.interp. The loop is timed for one time step and extrapolated.
+
+Usage: python -m benchmarks.bench_interp_pressure
+"""
+
+import timeit
+
+import numpy as np
+import xarray as xr
+
+from cesm._case.data import _interp_to_pressure, _pressure
+
+nyears, nlev, nlat, nlon = 2, 30, 96, 144
+
+# standard pressure levels (Pa)
+plevs = 100 * np.array(
+    [10, 20, 30, 50, 70, 100, 150, 200, 250, 300, 400, 500, 600, 700, 850, 925, 1000]
+)
+
+
+def dataset():
+    """monthly temperature and surface pressure"""
+
+    rng = np.random.default_rng(0)
+    ntime = nyears * 12
+
+    eta = np.linspace(0.003, 1, nlev + 1)
+    hybi = np.clip((eta - 0.2) / 0.8, 0, 1)
+    hyai = eta - hybi
+
+    hyam = xr.DataArray((hyai[1:] + hyai[:-1]) / 2, dims="lev")
+    hybm = xr.DataArray((hybi[1:] + hybi[:-1]) / 2, dims="lev")
+    P0 = xr.DataArray(100000.0)
+
+    PS = 100000 + rng.normal(scale=1000, size=(ntime, nlat, nlon))
+    PS = xr.DataArray(PS, dims=("time", "lat", "lon"))
+
+    pressure = _pressure(hyam, hybm, P0, PS)
+    T = 288 * (pressure / P0) ** 0.19
+
+    return T, PS, pressure
+
+
+def loop(T, pressure):
+    """interpolate every column separately"""
+
+    T, pressure = T.values, pressure.values
+    logplevs = np.log(plevs)
+
+    out = np.empty((T.shape[0], plevs.size) + T.shape[2:])
+    for t, i, j in np.ndindex(T.shape[0], T.shape[2], T.shape[3]):
+        logp = np.log(pressure[t, :, i, j])
+        out[t, :, i, j] = np.interp(
+            logplevs, logp, T[t, :, i, j], left=np.nan, right=np.nan
+        )
+
+    return out
+
+
+def main():
+
+    T, PS, pressure = dataset()
+
+    print(f"{nyears} years monthly, {nlev} levels, {nlat}x{nlon}, {plevs.size} plevs")
+
+    t_numpy = timeit.timeit(lambda: _interp_to_pressure(T, pressure, plevs), number=3)
+    print(f"vectorized (numpy):  {t_numpy / 3:8.3f} s")
+
+    T_dask, p_dask = T.chunk(time=6), pressure.chunk(time=6)
+
+    def dask():
+        _interp_to_pressure(T_dask, p_dask, plevs).compute()
+
+    t_dask = timeit.timeit(dask, number=3)
+    print(f"vectorized (dask):   {t_dask / 3:8.3f} s")
+
+    T1, p1 = T.isel(time=slice(0, 1)), pressure.isel(time=slice(0, 1))
+    t_loop = timeit.timeit(lambda: loop(T1, p1), number=1) * T.sizes["time"]
+    print(f"loop over columns:   {t_loop:8.3f} s (extrapolated)")
+
+
+if __name__ == "__main__":
+    main()
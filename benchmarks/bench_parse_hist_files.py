@@ -0,0 +1,66 @@
+"""compare the vectorized and the regex parser of history file names
+
+Creates synthetic listings of 1k, 10k and 100k names (monthly h0, daily h1
+and some files that do not match) and times both parsers.
+
+Usage: python -m benchmarks.bench_parse_hist_files
+"""
+
+import timeit
+
+import numpy as np
+
+from cesm._case.comp import _comp
+from cesm._case.inventory import _parse_hist_files, _parse_hist_files_re
+
+name = "b.e122.B2000.f19_g16.bench-io192.001"
+modname = "clm2"
+
+
+def listing(n):
+    """synthetic (sorted) content of a history folder with n files"""
+
+    hfiles = ["rpointer.lnd"]
+    year = 1
+    while len(hfiles) < n:
+        hfiles += [f"{name}.{modname}.h0.{year:04d}-{m:02d}.nc" for m in range(1, 13)]
+        hfiles += [f"{name}.{modname}.h1.{year:04d}-01-01-00000.nc"]
+        hfiles += [
+            f"{name}.{modname}.h2.{year:04d}-01-{d:02d}.nc" for d in range(1, 32)
+        ]
+        year += 1
+
+    return sorted(hfiles[:n])
+
+
+def main():
+
+    comp = type("comp", (), {"casedef": {"name": name}, "_modname": modname})
+    re_str = _comp.__get_re_string__(comp)
+    prefix = f"{name}.{modname}."
+
+    print(f"{'n files':>10} {'regex [s]':>10} {'vectorized [s]':>15} {'speedup':>8}")
+
+    for n in [1_000, 10_000, 100_000]:
+        hfiles = listing(n)
+
+        # make sure both return the same
+        expected, _ = _parse_hist_files_re(hfiles, re_str)
+        result, _ = _parse_hist_files(hfiles, re_str, prefix)
+        for key in expected:
+            np.testing.assert_equal(result[key], expected[key])
+
+        number = max(1, 10_000 // n)
+        t_re = timeit.timeit(
+            lambda: _parse_hist_files_re(hfiles, re_str), number=number
+        )
+        t_vec = timeit.timeit(
+            lambda: _parse_hist_files(hfiles, re_str, prefix), number=number
+        )
+
+        t_re, t_vec = t_re / number, t_vec / number
+        print(f"{n:>10} {t_re:>10.4f} {t_vec:>15.4f} {t_re / t_vec:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
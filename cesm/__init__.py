@@ -5,7 +5,9 @@ from .version import version
 
 __version__ = version
 
-from ._case.case import case, print_casenames
+from ._case.case import case, clear_cesm_cases_cache, print_casenames
 from ._case.combcase import combcase
 from ._case.comp import _atm, _ice, _lnd, _ocn
+from ._case.ensemble import ensemble
+from ._case.grids import registered_grids
 from ._load import load
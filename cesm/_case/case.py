@@ -1,9 +1,24 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 
 from .comp import _atm, _ice, _lnd, _ocn
 
+# use the faster libyaml loader if available
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# parsed cesm_cases files - shared by all case instances, see __read_yaml__
+_CASEDEFS_CACHE = dict()
+
+# class and name of the module of the components
+_COMPONENTS = {
+    "atm": (_atm, "cam"),
+    "lnd": (_lnd, "clm2"),
+    "ocn": (_ocn, "pop"),
+    "ice": (_ice, "cice"),
+}
+
 
 def print_casenames(cesm_cases_path="~/cesm_cases.yaml"):
     """pretty print all case names
@@ -24,6 +39,29 @@ def print_casenames(cesm_cases_path="~/cesm_cases.yaml"):
 # -----------------------------------------------------------------------------
 
 
+def clear_cesm_cases_cache(cesm_cases_path=None):
+    """remove parsed cesm_cases files from the cache
+
+    The cesm_cases file is only parsed again if its modification time or
+    size changes. Use this function to force re-reading it.
+
+    Parameters
+    ----------
+    cesm_cases_path : string | None
+        Path and name of the cesm_cases file. If None, clears the cache of
+        all files.
+
+    """
+
+    if cesm_cases_path is None:
+        _CASEDEFS_CACHE.clear()
+    else:
+        _CASEDEFS_CACHE.pop(os.path.expanduser(cesm_cases_path), None)
+
+
+# -----------------------------------------------------------------------------
+
+
 def __print_casenames__(casedefs):
     """loop cases for pretty print"""
 
@@ -58,7 +96,9 @@ class case:
 
     """A case is a cesm simulation."""
 
-    def __init__(self, case_name, ens=None, cesm_cases_path="~/cesm_cases.yaml"):
+    def __init__(
+        self, case_name, ens=None, cesm_cases_path="~/cesm_cases.yaml", casedefs=None
+    ):
         """
         Parameters
         ==========
@@ -69,13 +109,17 @@ class case:
         cesm_cases_path : string
             Path and name of the cesm_cases file.
             Default: ~/cesm_cases.yaml.
+        casedefs : dict | None
+            Already parsed content of the cesm_cases file. If given,
+            cesm_cases_path is not read again.
         """
 
         super().__init__()
         self.case_name = case_name
+        self.ens = ens
 
         self.cesm_cases_path = cesm_cases_path
-        self.casedef = __parse_yaml__(case_name, ens, cesm_cases_path)
+        self.casedef = __parse_yaml__(case_name, ens, cesm_cases_path, casedefs)
 
         # check something exists at this location
         if not os.path.isdir(self.casedef["folder_hist"]):
@@ -109,11 +153,7 @@ class case:
 
     def __call__(self, comp, hist=None):
 
-        components = ["atm", "lnd", "ocn", "ice"]
-        if comp not in components:
-            cp = "'{}'".format("', '".join(components))
-            msg = f"comp ('{comp}') must be any of: {cp}"
-            raise KeyError(msg)
+        __check_comp__(comp)
 
         comp = getattr(self, comp)
 
@@ -132,6 +172,63 @@ class case:
         )
         return msg
 
+    def refresh(self):
+        """parse history files that were added since the last scan
+
+        Only components that were already accessed are considered.
+
+        Returns
+        =======
+        n_new : dict
+            Number of new files per component and history stream, e.g.
+            ``{"lnd": {"h0": 12}}``.
+        """
+
+        n_new = dict()
+        for comp in _COMPONENTS:
+            _comp = getattr(self, "_" + comp)
+
+            if _comp is not None:
+                n = _comp.refresh()
+                if n:
+                    n_new[comp] = n
+
+        return n_new
+
+    def discover(self, components=None, max_workers=None):
+        """parse the history files of several components concurrently
+
+        Listing the history folders is I/O bound (especially on network
+        file systems), so they are scanned in a thread pool.
+
+        Parameters
+        ==========
+        components : list of str | None
+            Components to parse, any of 'atm', 'lnd', 'ocn', 'ice'. None
+            parses all four and skips those without history folder.
+            Components that were already accessed are skipped.
+        max_workers : int | None
+            Maximum number of threads. See ThreadPoolExecutor.
+
+        ..Note::
+          If a component can not be parsed, the components that were parsed
+          are kept and the first error is raised.
+        """
+
+        skip_missing = components is None
+
+        if components is None:
+            components = list(_COMPONENTS)
+
+        for comp in components:
+            __check_comp__(comp)
+
+        tasks = [
+            (self, comp) for comp in components if getattr(self, "_" + comp) is None
+        ]
+
+        _scan_components(tasks, max_workers, skip_missing)
+
     # -------------------------------------------------------------------------
     # only parse the files if a component is accessed
 
@@ -163,6 +260,71 @@ class case:
 # =============================================================================
 
 
+def __check_comp__(comp):
+    """error if comp is not a known component"""
+
+    if comp not in _COMPONENTS:
+        cp = "'{}'".format("', '".join(_COMPONENTS))
+        msg = f"comp ('{comp}') must be any of: {cp}"
+        raise KeyError(msg)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _scan_components(tasks, max_workers=None, skip_missing=False):
+    """create the components of one or several cases in a thread pool
+
+    Parameters
+    ==========
+    tasks : list of (case, str)
+        The case and the name of the component (e.g. 'lnd') to create.
+    max_workers : int | None
+        Maximum number of threads. See ThreadPoolExecutor.
+    skip_missing : bool, default: False
+        If True, components without history folder are skipped, else the
+        error is raised.
+
+    ..Note::
+      The components that could be created are assigned to their case
+      before the first error (in the order of tasks) is raised.
+    """
+
+    def _scan(task):
+        case, comp = task
+        cls, modname = _COMPONENTS[comp]
+
+        try:
+            return cls(case, modname)
+        except FileNotFoundError:
+            if skip_missing:
+                return None
+            raise
+
+    if not tasks:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_scan, task) for task in tasks]
+
+    error = None
+    for (case, comp), future in zip(tasks, futures):
+        try:
+            _comp = future.result()
+        except Exception as err:
+            error = err if error is None else error
+            continue
+
+        if _comp is not None:
+            setattr(case, "_" + comp, _comp)
+
+    if error is not None:
+        raise error
+
+
+# -----------------------------------------------------------------------------
+
+
 def __read_yaml__(path_or_yaml_str):
     """read the cesm_case file
 
@@ -171,18 +333,20 @@ def __read_yaml__(path_or_yaml_str):
     path : string
         Full name of the yaml file. May contain '~', expanded to home.
         Alternatively path may be a yaml string (for testing).
+
+    ..Note::
+      The parsed files are cached and only read again if their modification
+      time or size changes. The returned dict must not be modified.
     """
 
     # expand '~' to '/home/$USER'
     expanded_path = os.path.expanduser(path_or_yaml_str)
 
     try:
-        # normal: read a file
-        with open(expanded_path) as stream:
-            return yaml.load(stream, yaml.SafeLoader)
+        stat = os.stat(expanded_path)
     except OSError as exception:
         # if a valid yaml string is passed
-        yaml_parsed = yaml.load(path_or_yaml_str, yaml.SafeLoader)
+        yaml_parsed = __load_cached__(path_or_yaml_str, None, lambda: path_or_yaml_str)
 
         if isinstance(yaml_parsed, dict):
             return yaml_parsed
@@ -190,17 +354,39 @@ def __read_yaml__(path_or_yaml_str):
             # raise the path-not-found exception
             raise exception
 
+    def _read():
+        with open(expanded_path) as stream:
+            return stream.read()
+
+    # normal: read a file
+    return __load_cached__(expanded_path, (stat.st_mtime_ns, stat.st_size), _read)
+
+
+def __load_cached__(key, version, read):
+    """parse yaml - or get it from the cache if the version did not change"""
+
+    cached = _CASEDEFS_CACHE.get(key, None)
+
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    yaml_parsed = yaml.load(read(), _YAML_LOADER)
+    _CASEDEFS_CACHE[key] = (version, yaml_parsed)
+
+    return yaml_parsed
+
 
 # -----------------------------------------------------------------------------
 
 
-def __parse_yaml__(case_name, ens, cesm_cases_path):
+def __parse_yaml__(case_name, ens, cesm_cases_path, casedefs=None):
     """
     parse the cesm_case yaml file
     """
 
     # read yaml file
-    casedefs = __read_yaml__(cesm_cases_path)
+    if casedefs is None:
+        casedefs = __read_yaml__(cesm_cases_path)
 
     # case exists?
     casedef = casedefs.get(case_name, None)
@@ -217,13 +403,16 @@ def __parse_yaml__(case_name, ens, cesm_cases_path):
             msg = (
                 "'{case}' is an ensemble."
                 " Specify 'ens' in the range of 0 to {ncases}".format(
-                    case=case_name, ncases=len(case) - 1
+                    case=case_name, ncases=len(casedef) - 1
                 )
             )
             raise KeyError(msg)
 
         casedef = casedef[ens]
 
+    # the entries are modified below - do not alter casedefs
+    casedef = dict(casedef)
+
     if "resolution" not in casedef.keys():
         casedef["resolution"] = "f19_g16"
 
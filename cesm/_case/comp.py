@@ -5,6 +5,13 @@ import warnings
 import numpy as np
 
 from .data import _data_atm, _data_lnd
+from .grids import _get_grid
+from .inventory import (
+    _inventory_file,
+    _parse_hist_files,
+    _read_inventory,
+    _write_inventory,
+)
 from .post import post_cls
 
 
@@ -27,15 +34,15 @@ class _comp:
 
         self.has_histfiles = False
 
+        self.post = post_cls(
+            self.folder_post, case.casedef, "no_hist", modname, add_hist=False
+        )
+
         self.__parse_hist_files__()
 
         self.__atm_data = None
         self.__lnd_data = None
 
-        self.post = post_cls(
-            self.folder_post, case.casedef, "no_hist", modname, add_hist=False
-        )
-
     def __repr__(self):
         msg = "'{}' component of the CESM Case '{}'"
         msg = msg.format(self.comp, self.casedef["case_name"])
@@ -48,7 +55,9 @@ class _comp:
             raise RuntimeError("Has not atm histfiles.")
 
         if self._case.atm.__atm_data is None:
-            self.__atm_data = _data_atm(getattr(self._case.atm, "h0", None))
+            # shared by all cases on the same grid
+            h0 = getattr(self._case.atm, "h0", None)
+            self.__atm_data = _get_grid(_data_atm, h0)
 
         return self.__atm_data
 
@@ -59,7 +68,9 @@ class _comp:
             raise RuntimeError("Has not lnd histfiles.")
 
         if self._case.lnd.__lnd_data is None:
-            self.__lnd_data = _data_lnd(getattr(self._case.lnd, "h0", None))
+            # shared by all cases on the same grid
+            h0 = getattr(self._case.lnd, "h0", None)
+            self.__lnd_data = _get_grid(_data_lnd, h0)
 
         return self.__lnd_data
 
@@ -145,82 +156,198 @@ class _comp:
         # files = sorted(glob.glob(self.folder_hist + '/*'))
         # return [os.path.basename(ff) for ff in files]
 
-    def __parse_hist_files__(self):
-        """read h0/ h1 year, month, etc. from hist files"""
+    def __inventory_file__(self):
+        """name of the file caching the parsed history files"""
+        fN = self.post.pre_suf(suffix="hist_inventory", file_type="npz")
+        return _inventory_file(fN, self.folder_hist)
+
+    def __get_inventory__(self):
+        """parsed history files - read from the cache if still valid"""
+
+        inventory = _read_inventory(
+            self.__inventory_file__(), self.folder_hist, self.__prefix__()
+        )
+
+        if inventory is not None:
+            return inventory
 
+        # get the mtime before listing the folder
+        mtime = os.stat(self.folder_hist).st_mtime_ns
         hfiles = self.__get_hist_files__()
-        self.histfiles = hfiles
 
-        # create empty lists
-        filename, fullname, hist = [], [], []
-        year, month, day, second = [], [], [], []
+        inventory = self.__parse_filenames__(hfiles)
+        inventory["histfiles"] = hfiles
+        inventory["mtime"] = mtime
 
-        is_zipped = ""
-        for h in hfiles:
+        self.__save_inventory__(inventory)
 
-            # find files that match
-            reg = self._re_str.search(h)
+        return inventory
 
-            if reg:
+    def __save_inventory__(self, inventory):
+        """persist the parsed history files"""
+        _write_inventory(self.__inventory_file__(), inventory, self.__prefix__())
 
-                filename.append(h)
-                fullname.append(os.path.join(self.folder_hist, h))
-                hist += [reg.group("hist").replace(".", "_")]
-                year += [reg.group("year")]
-                month += [reg.group("month")]
+    def __prefix__(self):
+        """name of the run and module (e.g. 'name.clm2')"""
+        return self.casedef["name"] + "." + self._modname
 
-                # replace None
-                day += [reg.group("day") if reg.group("day") else "1"]
-                second += [reg.group("second") if reg.group("second") else "0"]
+    def __parse_filenames__(self, hfiles):
+        """read hist, year, month, etc. from a list of file names"""
 
-                if not is_zipped:
-                    is_zipped = reg.group("zip")
+        prefix = self.__prefix__() + "."
+        inventory, is_zipped = _parse_hist_files(hfiles, self._re_str, prefix)
+        inventory["is_zipped"] = is_zipped
 
-            else:
-                pass
+        return inventory
 
-        filename = np.array(filename)
-        fullname = np.array(fullname)
-        hist = np.array(hist, dtype=np.str)
-        year = np.array(year, dtype=np.int)
-        month = np.array(month, dtype=np.int)
-        day = np.array(day, dtype=np.int)
-        second = np.array(second, dtype=np.int)
+    def __parse_hist_files__(self):
+        """read h0/ h1 year, month, etc. from hist files"""
+
+        inventory = self.__get_inventory__()
+
+        self._inventory = inventory
+        self.histfiles = list(inventory["histfiles"])
 
         # determine available history streams
-        self._hist_unique = np.unique(hist).tolist()
+        self._hist_unique = []
+        self.__add_hist_files__(inventory)
+
+        self.__warn_zipped__(inventory["is_zipped"])
+
+    def __add_hist_files__(self, inventory):
+        """add parsed files to new or existing history streams"""
 
         from .hist import _hist
 
-        # add history stream as attribute
-        for h in self._hist_unique:
+        filename = inventory["filename"]
+        fullname = np.array(
+            [os.path.join(self.folder_hist, h) for h in filename], dtype=str
+        )
+        hist = inventory["hist"]
+
+        n_new = dict()
+        for h in np.unique(hist).tolist():
             # all files that are from this given hist stream
             sel = hist == h
-            # create individual hist class
-            hist_class = _hist(
-                h,
+
+            files = (
                 filename[sel],
                 fullname[sel],
-                year[sel],
-                month[sel],
-                day[sel],
-                second[sel],
-                self.folder_post,
-                self._case,
-                self._modname,
-                self.comp,
+                inventory["year"][sel],
+                inventory["month"][sel],
+                inventory["day"][sel],
+                inventory["second"][sel],
             )
 
-            # add it as an attribute
-            setattr(self, str(h), hist_class)
+            if h in self._hist_unique:
+                getattr(self, h)._append(*files)
+            else:
+                # create individual hist class
+                hist_class = _hist(
+                    h,
+                    *files,
+                    self.folder_post,
+                    self._case,
+                    self._modname,
+                    self.comp,
+                )
+
+                # add it as an attribute
+                setattr(self, str(h), hist_class)
+                self._hist_unique.append(h)
 
-        if len(fullname):
+            n_new[h] = int(sel.sum())
+
+        self._hist_unique.sort()
+
+        if len(filename):
             self.has_histfiles = True
 
+        return n_new
+
+    def __warn_zipped__(self, is_zipped):
         if is_zipped:
             msg = f"{self.comp} is probably zipped (file ending: {is_zipped})"
             warnings.warn(msg)
 
+    def refresh(self):
+        """parse history files that were added since the last scan
+
+        Only the names of new files are parsed and appended to the existing
+        history streams. Intended for simulations that are still running.
+
+        Returns
+        =======
+        n_new : dict
+            Number of new files for every history stream that gained files.
+
+        ..Note::
+          If files were removed all files are parsed again.
+        """
+
+        mtime = os.stat(self.folder_hist).st_mtime_ns
+
+        # nothing was added or removed
+        if mtime == self._inventory["mtime"]:
+            return dict()
+
+        hfiles = self.__get_hist_files__()
+
+        known = set(self.histfiles)
+        new_files = [h for h in hfiles if h not in known]
+
+        # files were removed - start from scratch
+        if len(hfiles) - len(new_files) != len(known):
+            return self.__rescan__(hfiles, mtime)
+
+        new = self.__parse_filenames__(new_files)
+        n_new = self.__add_hist_files__(new)
+
+        # merge the new files into the inventory, keep it sorted
+        inventory = self._inventory
+        idx = np.argsort(np.concatenate([inventory["filename"], new["filename"]]))
+        for key in ("filename", "hist", "year", "month", "day", "second"):
+            inventory[key] = np.concatenate([inventory[key], new[key]])[idx]
+
+        inventory["histfiles"] = hfiles
+        inventory["mtime"] = mtime
+        if not inventory["is_zipped"]:
+            inventory["is_zipped"] = new["is_zipped"]
+
+        self.histfiles = hfiles
+        self.__save_inventory__(inventory)
+
+        self.__warn_zipped__(new["is_zipped"])
+
+        return n_new
+
+    def __rescan__(self, hfiles, mtime):
+        """parse all history files again, see ``refresh``"""
+
+        n_old = {h: len(getattr(self, h).year) for h in self._hist_unique}
+
+        for h in self._hist_unique:
+            delattr(self, h)
+
+        inventory = self.__parse_filenames__(hfiles)
+        inventory["histfiles"] = hfiles
+        inventory["mtime"] = mtime
+
+        self.__save_inventory__(inventory)
+
+        self._inventory = inventory
+        self.histfiles = hfiles
+
+        self._hist_unique = []
+        self.has_histfiles = False
+        n_all = self.__add_hist_files__(inventory)
+
+        self.__warn_zipped__(inventory["is_zipped"])
+
+        n_new = {h: n - n_old.get(h, 0) for h, n in n_all.items()}
+
+        return {h: n for h, n in n_new.items() if n > 0}
+
     def sel(self, hist, year=None, month=None, day=None, second=None, last=True):
 
         # if isinstance(hist, int):
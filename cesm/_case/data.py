@@ -1,24 +1,37 @@
 import numpy as np
+import xarray as xr
 
 from cesm.utils import xarray_utils as xu
 
+from .grids import _grid
+from .static import _get_static
+
+# weighting of the gridcells for global and regional means - see _cell_weights
+_WEIGHTINGS = ("coslat", "coslat_landfrac", "area", "area_landfrac")
+
 
 class _data:
 
     """docstring for _data"""
 
-    def __init__(self, h0):
+    # name of the component and the static fields, see __get_grid__
+    _comp = None
+    _static_fields = ("lat", "lon")
+
+    def __init__(self, h0, grid=None):
 
         self._h0 = h0
         self._lat_name = "lat"
         self._lon_name = "lon"
 
-        self.filename = h0[0]
-
         self._weight = None
         self._lat = None
         self._lon = None
 
+        # static fields and cached weights, shared by the cases on the same
+        # grid (see grids._get_grid) - must not refer to this case
+        self._grid = grid
+
     @property
     def lat(self):
         return self.__get_prop__("_lat", self._lat_name)
@@ -27,6 +40,11 @@ class _data:
     def lon(self):
         return self.__get_prop__("_lon", self._lon_name)
 
+    @property
+    def filename(self):
+        """the first history file of the case, for fields that are not static"""
+        return self._h0[0]
+
     # weight is special
     @property
     def weight(self):
@@ -34,6 +52,109 @@ class _data:
             self._weight = CosWgt(self.lat)
         return self._weight
 
+    def global_mean(self, da, kind="coslat"):
+        """
+        weighted mean over lat and lon
+
+        Faster than xarray's weighted mean for long time series: the
+        normalized weights are computed once per grid and applied with one
+        tensordot (NaN are skipped like in xarray).
+
+        Parameters
+        ----------
+        da : xarray DataArray
+            Field on the grid of the case with the dimensions lat and lon.
+        kind : str, optional
+            Weight of the gridcells: 'coslat' (cosine of the latitude),
+            'coslat_landfrac', 'area' (gridcell area) or 'area_landfrac'
+            (land area). area is only available for lnd. Default: 'coslat'.
+
+        Returns
+        -------
+        mean : xarray DataArray
+            The global mean, without the dimensions lat and lon.
+        """
+
+        spatial = (self._lat_name, self._lon_name)
+
+        weights = self._get_global_weights(kind)
+
+        da = da.transpose(..., *spatial)
+
+        if da.shape[-2:] != weights.shape:
+            msg = "da is not on the grid of the case"
+            raise ValueError(msg)
+
+        data = np.asarray(da.values, dtype=float)
+        isnan = np.isnan(data)
+
+        if not isnan.any():
+            mean = np.tensordot(data, weights, axes=2)
+        else:
+            num = np.tensordot(np.where(isnan, 0, data), weights, axes=2)
+            den = np.tensordot(~isnan, weights, axes=2)
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(den != 0, num / den, np.nan)
+
+        coords = {
+            name: coord
+            for name, coord in da.coords.items()
+            if not set(coord.dims) & set(spatial)
+        }
+
+        return xr.DataArray(
+            mean, dims=da.dims[:-2], coords=coords, attrs=da.attrs, name=da.name
+        )
+
+    def _cell_weights(self, weighting):
+        """
+        weight of every gridcell
+
+        Parameters
+        ----------
+        weighting : str
+            One of 'coslat', 'coslat_landfrac', 'area' and 'area_landfrac'.
+            The cosine of the latitude or the area of the gridcells,
+            optionally multiplied with the land fraction.
+
+        Returns
+        -------
+        weight : xarray DataArray
+            Weights with the dimensions (lat, lon).
+        """
+
+        if weighting not in _WEIGHTINGS:
+            weightings = "', '".join(_WEIGHTINGS)
+            msg = f"weighting ('{weighting}') must be any of: '{weightings}'"
+            raise ValueError(msg)
+
+        kind, _, landfrac = weighting.partition("_")
+
+        weight = self.weight if kind == "coslat" else self.area
+
+        if landfrac:
+            weight = weight * self.landfrac
+
+        # cos(lat) does not depend on lon
+        weight, _ = xr.broadcast(weight, self.lon)
+
+        return weight.transpose(self._lat_name, self._lon_name)
+
+    def _get_global_weights(self, kind):
+        """normalized weights as numpy array (lat, lon)"""
+
+        global_weights = self.__get_grid__().global_weights
+
+        if kind not in global_weights:
+
+            weight = self._cell_weights(kind).values
+            weight = np.where(np.isfinite(weight), weight, 0)
+
+            global_weights[kind] = weight / weight.sum()
+
+        return global_weights[kind]
+
     def __get_prop__(self, name, varname):
         # only load data if required
         if getattr(self, name) is None:
@@ -42,7 +163,20 @@ class _data:
 
     def __get_data__(self, varname):
 
-        return xu.open_cesm(self.filename)[varname]
+        static = self.__get_grid__().static
+
+        if varname in static.variables:
+            return static[varname]
+
+        with xu.open_cesm(self.filename, variables=varname) as ds:
+            return ds[varname].load()
+
+    def __get_grid__(self):
+        # read all static fields at once (and cache them to disk)
+        if self._grid is None:
+            static, _ = _get_static(self._h0, self._static_fields, self._comp)
+            self._grid = _grid(static)
+        return self._grid
 
 
 # =============================================================================
@@ -52,8 +186,11 @@ class _data_lnd(_data):
 
     """docstring for _data_land"""
 
-    def __init__(self, h0):
-        super().__init__(h0)
+    _comp = "lnd"
+    _static_fields = ("lat", "lon", "area", "landfrac", "landmask", "DZSOI", "ZSOI")
+
+    def __init__(self, h0, grid=None):
+        super().__init__(h0, grid)
 
         self._area = None
         self._landfrac = None
@@ -89,8 +226,11 @@ class _data_lnd(_data):
 class _data_atm(_data):
     """docstring for _data_land"""
 
-    def __init__(self, h0):
-        super().__init__(h0)
+    _comp = "atm"
+    _static_fields = ("lat", "lon", "LANDFRAC", "hyam", "hybm", "hyai", "hybi", "P0")
+
+    def __init__(self, h0, grid=None):
+        super().__init__(h0, grid)
 
         self._landfrac = None
         self._hyam = None
@@ -102,7 +242,7 @@ class _data_atm(_data):
 
     @property
     def landfrac(self):
-        return self.__get_prop__("_landfrac", "LANDFRAC").isel(time=0)
+        return self.__get_prop__("_landfrac", "LANDFRAC")
 
     @property
     def hyam(self):
@@ -128,10 +268,158 @@ class _data_atm(_data):
     def P0(self):
         return self.__get_prop__("_P0", "P0")
 
+    def pressure(self, PS, interfaces=False):
+        """
+        pressure of the hybrid sigma-pressure levels
+
+        p = hya * P0 + hyb * PS
+
+        Parameters
+        ----------
+        PS : xarray DataArray
+            Surface pressure (Pa).
+        interfaces : bool, optional
+            If True, the pressure at the layer interfaces ('ilev'), else at
+            the midpoints ('lev'). Default: False.
+
+        Returns
+        -------
+        pressure : xarray DataArray
+            Pressure (Pa) with the dimensions of PS and the level dimension
+            in front of lat and lon.
+        """
+
+        if interfaces:
+            hya, hyb = self.hyai, self.hybi
+        else:
+            hya, hyb = self.hyam, self.hybm
+
+        return _pressure(hya, hyb, self.P0, PS)
+
+    def interp_to_pressure(self, da, PS, plevs):
+        """
+        interpolate a field on hybrid levels to pressure levels
+
+        Linear interpolation in log(pressure), for all columns at once. dask
+        arrays are processed in parallel over their chunks (the level
+        dimension must not be chunked). Pressure levels below the surface or
+        above the model top are NaN.
+
+        Parameters
+        ----------
+        da : xarray DataArray
+            Field with the dimension 'lev' or 'ilev'.
+        PS : xarray DataArray
+            Surface pressure (Pa) at the same time steps.
+        plevs : array_like
+            Pressure levels (Pa).
+
+        Returns
+        -------
+        interpolated : xarray DataArray
+            The field with the dimension 'plev' instead of the level.
+        """
+
+        interfaces = "ilev" in da.dims
+
+        pressure = self.pressure(PS, interfaces=interfaces)
+
+        return _interp_to_pressure(da, pressure, plevs)
+
 
 # =============================================================================
 
 
+def _pressure(hya, hyb, P0, PS):
+    """pressure of hybrid sigma-pressure levels (see _data_atm.pressure)"""
+
+    (lev,) = hya.dims
+
+    pressure = hya * P0 + hyb * PS
+
+    other = [dim for dim in PS.dims if dim not in ("lat", "lon")]
+    pressure = pressure.transpose(*other, lev, ...)
+
+    pressure.name = "pressure"
+    pressure.attrs = dict(units="Pa", long_name="pressure")
+
+    return pressure
+
+
+def _interp_to_pressure(da, pressure, plevs):
+    """interpolate da to pressure levels (see _data_atm.interp_to_pressure)"""
+
+    (lev,) = [dim for dim in pressure.dims if dim in ("lev", "ilev")]
+
+    plevs = np.asarray(plevs, dtype=float)
+
+    result = xr.apply_ufunc(
+        _interp_log_pressure,
+        da,
+        pressure,
+        input_core_dims=[[lev], [lev]],
+        output_core_dims=[["plev"]],
+        kwargs=dict(plevs=plevs),
+        dask="parallelized",
+        output_dtypes=[float],
+        dask_gufunc_kwargs=dict(output_sizes={"plev": plevs.size}),
+        keep_attrs=True,
+    )
+
+    result = result.assign_coords(plev=("plev", plevs, dict(units="Pa")))
+
+    # plev at the position of the level dimension
+    dims = ["plev" if dim == lev else dim for dim in da.dims]
+
+    return result.transpose(*dims)
+
+
+def _interp_log_pressure(data, pressure, plevs):
+    """
+    linear interpolation in log(pressure) along the last axis
+
+    Parameters
+    ----------
+    data, pressure : ndarray
+        Arrays with the levels along the last axis, pressure must increase
+        along this axis (i.e. from the model top to the surface).
+    plevs : ndarray
+        Target pressure levels.
+
+    Returns
+    -------
+    interpolated : ndarray
+        Array with the plevs along the last axis.
+    """
+
+    data, pressure = np.broadcast_arrays(data, pressure)
+
+    logp = np.log(pressure)
+    target = np.log(plevs)
+
+    n_lev = logp.shape[-1]
+
+    # vectorized searchsorted: number of levels above each target level
+    idx = np.count_nonzero(logp[..., np.newaxis, :] < target[:, np.newaxis], axis=-1)
+
+    upper = idx.clip(1, n_lev - 1)
+    lower = upper - 1
+
+    logp0 = np.take_along_axis(logp, lower, axis=-1)
+    logp1 = np.take_along_axis(logp, upper, axis=-1)
+    data0 = np.take_along_axis(data, lower, axis=-1)
+    data1 = np.take_along_axis(data, upper, axis=-1)
+
+    weight = (target - logp0) / (logp1 - logp0)
+
+    interpolated = data0 + weight * (data1 - data0)
+
+    # no extrapolation
+    outside = (weight < 0) | (weight > 1)
+
+    return np.where(outside, np.nan, interpolated)
+
+
 def CosWgt(lat):
     """cosine-weighted latitude"""
     return np.cos(np.deg2rad(lat))
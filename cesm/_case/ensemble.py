@@ -0,0 +1,183 @@
+import warnings
+
+import numpy as np
+
+from .case import (
+    _COMPONENTS,
+    __is_ensemble__,
+    __read_yaml__,
+    _scan_components,
+    case,
+    print_casenames,
+)
+from .hist import _hist
+
+
+class ensemble:
+
+    """All members of an ensemble of CESM simulations."""
+
+    def __init__(
+        self,
+        case_name,
+        components=None,
+        max_workers=None,
+        cesm_cases_path="~/cesm_cases.yaml",
+    ):
+        """
+        Parameters
+        ==========
+        case_name : string
+            One of the ensembles registered in the cesm_cases file.
+        components : list of str | None
+            Components for which the history files of all members are
+            parsed, any of 'atm', 'lnd', 'ocn', 'ice'. None parses all four
+            and skips those without history folder.
+        max_workers : int | None
+            Maximum number of threads used to parse the history files. See
+            ThreadPoolExecutor.
+        cesm_cases_path : string
+            Path and name of the cesm_cases file.
+            Default: ~/cesm_cases.yaml.
+        """
+
+        self.case_name = case_name
+        self.cesm_cases_path = cesm_cases_path
+
+        # read the yaml file only once for all members
+        casedefs = __read_yaml__(cesm_cases_path)
+
+        casedef = casedefs.get(case_name, None)
+
+        if casedef is None:
+            print_casenames(cesm_cases_path)
+            msg = f"'{case_name}' is not known. See above."
+            raise KeyError(msg)
+
+        if not __is_ensemble__(casedef):
+            msg = f"'{case_name}' is not an ensemble. Use 'cesm.case'."
+            raise ValueError(msg)
+
+        self.members = [
+            case(case_name, ens, cesm_cases_path, casedefs=casedefs)
+            for ens in range(len(casedef))
+        ]
+
+        skip_missing = components is None
+
+        if components is None:
+            components = list(_COMPONENTS)
+
+        # parse the history files of all members and components concurrently
+        tasks = [(member, comp) for member in self.members for comp in components]
+        _scan_components(tasks, max_workers, skip_missing)
+
+        self._stacked = dict()
+
+    def __len__(self):
+        return len(self.members)
+
+    def __getitem__(self, ens):
+        return self.members[ens]
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __repr__(self):
+        msg = "CESM Ensemble: {} ({} members)"
+        return msg.format(self.case_name, len(self))
+
+    def __stack__(self, comp, hist):
+        """concatenate the history files of all members"""
+
+        key = (comp, hist)
+
+        hists = [member(comp, hist) for member in self.members]
+
+        # the files of the members change with member.refresh()
+        sources = [h._fullname for h in hists]
+        cached_sources, _ = self._stacked.get(key, (None, None))
+
+        if cached_sources is None or any(
+            old is not new for old, new in zip(cached_sources, sources)
+        ):
+
+            stacked = dict(
+                member=np.concatenate(
+                    [np.full(len(h.year), i) for i, h in enumerate(hists)]
+                )
+            )
+
+            for name in ["_fullname", "year", "month", "day", "second"]:
+                stacked[name] = np.concatenate([getattr(h, name) for h in hists])
+
+            self._stacked[key] = (sources, stacked)
+
+        return self._stacked[key][1]
+
+    def sel(self, comp, hist, year=None, month=None, day=None, second=None, last=True):
+        """
+        Select history files of all members at once.
+
+        Parameters
+        ==========
+        comp : str
+            Component, e.g. 'lnd'.
+        hist : str
+            History stream, e.g. 'h0'.
+        year : None | int | slice
+            Select year. See below.
+        month : None | int | slice
+            Select month. See below.
+        day : None | int | slice
+            Select day. See below.
+        second : None | int | slice
+            Select second. See below.
+        last : bool
+            If False, the last file of every member is not selected.
+
+        Returns
+        =======
+        filename : 2D array of strings
+            Table of the selected files with one row per member and one
+            column per time step (sorted by year, month, day, second).
+            Files that do not exist for a member are empty strings.
+
+        ..Note::
+          None makes no selection.
+          int select exclusively this number.
+          slice(start, end) selects range (inclusive).
+
+        """
+
+        stacked = self.__stack__(comp, hist)
+        member = stacked["member"]
+
+        sel = np.ones(member.shape, dtype=bool)
+
+        for name, condition in zip(
+            ["year", "month", "day", "second"], [year, month, day, second]
+        ):
+            sel = _hist.__get_sel_single__(sel, stacked[name], condition)
+
+        if not last:
+            # last file of every member
+            is_last = np.append(member[1:] != member[:-1], True)
+            sel &= ~is_last
+
+        if not np.any(sel):
+            msg = "sel is empty. Nothing selected."
+            warnings.warn(msg, RuntimeWarning)
+
+        # find the column of every selected file
+        dates = np.stack(
+            [stacked[name][sel] for name in ["year", "month", "day", "second"]],
+            axis=1,
+        )
+        dates, column = np.unique(dates, axis=0, return_inverse=True)
+
+        fullname = stacked["_fullname"]
+        table = np.full((len(self), len(dates)), "", dtype=fullname.dtype)
+        table[member[sel], column.ravel()] = fullname[sel]
+
+        return table
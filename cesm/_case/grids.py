@@ -0,0 +1,91 @@
+import weakref
+
+from .static import _get_static
+
+# the grids in memory (_grid objects), shared by all cases on the same grid -
+# an entry is removed when no case refers to it anymore
+_GRIDS = weakref.WeakValueDictionary()
+
+
+class _grid:
+
+    """static fields and cached weights of one grid, shared by the cases"""
+
+    def __init__(self, static, key=None):
+
+        # all static fields (loaded once)
+        self.static = static
+
+        # component, resolution and grid hash (None if not registered)
+        self.key = key
+
+        # normalized weights for global_mean
+        self.global_weights = dict()
+
+    @property
+    def nbytes(self):
+        """memory used by the static fields and the cached weights"""
+        nbytes = self.static.nbytes
+        nbytes += sum(w.nbytes for w in self.global_weights.values())
+        return nbytes
+
+
+def _get_grid(cls, h0):
+    """
+    the grid data of a component, the grid is shared by all cases
+
+    Parameters
+    ----------
+    cls : _data_lnd | _data_atm
+        Class of the grid data.
+    h0 : cesm hist class
+        The h0 history files of the component.
+
+    Returns
+    -------
+    data : cls
+        The grid data of h0. Its static fields and cached weights (see
+        _grid) are shared with the other cases on the same grid (component,
+        resolution and grid hash) that are in memory.
+    """
+
+    static, key = _get_static(h0, cls._static_fields, cls._comp)
+
+    grid = _GRIDS.get(key)
+
+    if grid is None:
+        grid = _grid(static, key)
+        _GRIDS[key] = grid
+
+    return cls(h0, grid=grid)
+
+
+# -----------------------------------------------------------------------------
+
+
+def registered_grids():
+    """
+    list the grids in memory
+
+    Cases on the same grid share the grid data (lat, lon, area, landfrac,
+    ...) of each component.
+
+    Returns
+    -------
+    grids : list of dict
+        One dict per grid with the keys 'comp', 'resolution', 'grid_hash'
+        and 'nbytes' (memory used by the static fields and cached weights).
+    """
+
+    grids = []
+    for (comp, resolution, grid_hash), grid in list(_GRIDS.items()):
+        grids.append(
+            dict(
+                comp=comp,
+                resolution=resolution,
+                grid_hash=grid_hash,
+                nbytes=grid.nbytes,
+            )
+        )
+
+    return grids
@@ -2,6 +2,8 @@ import warnings
 
 import numpy as np
 
+from cesm.utils import xarray_utils as xu
+
 from .post import post_cls
 
 # CODE SAMPLE -> SUBCLASS str TO add 'folder_post' to every string
@@ -86,6 +88,27 @@ class _hist:
             self.__atm_data = self._case.atm._atm_data
         return self.__atm_data
 
+    def _append(self, filename, fullname, year, month, day, second):
+        """add history files to this stream (in place)"""
+
+        self._filename = np.concatenate([self._filename, filename])
+        self._fullname = np.concatenate([self._fullname, fullname])
+        self.year = np.concatenate([self.year, year])
+        self.month = np.concatenate([self.month, month])
+        self.day = np.concatenate([self.day, day])
+        self.second = np.concatenate([self.second, second])
+
+        # new files are normally the newest - else restore the order
+        if np.any(self._filename[:-1] > self._filename[1:]):
+            idx = np.argsort(self._filename)
+
+            self._filename = self._filename[idx]
+            self._fullname = self._fullname[idx]
+            self.year = self.year[idx]
+            self.month = self.month[idx]
+            self.day = self.day[idx]
+            self.second = self.second[idx]
+
     def __getitem__(self, key):
         out = self._fullname[key].tolist()
 
@@ -180,6 +203,51 @@ class _hist:
 
         return self[sel]
 
+    def open(
+        self,
+        varnames=None,
+        year=None,
+        month=None,
+        day=None,
+        second=None,
+        last=True,
+        chunks=None,
+        **kwargs,
+    ):
+        """
+        Lazily open the selected history files as one dask-backed dataset.
+
+        Parameters
+        ==========
+        varnames : None | str | list of str
+            Variables to keep. None keeps all variables.
+        year : None | int | slice
+            Select year. See sel.
+        month : None | int | slice
+            Select month. See sel.
+        day : None | int | slice
+            Select day. See sel.
+        second : None | int | slice
+            Select second. See sel.
+        chunks : None | int | dict
+            Chunk sizes, e.g. {"time": 12}. By default every file is one
+            chunk.
+        **kwargs : keyword arguments
+            Passed to xarray_utils.open_mfcesm.
+
+        Returns
+        =======
+        dataset : xarray Dataset
+            Nothing is read before the data is computed or loaded.
+
+        """
+
+        sel = self._get_sel(year, month, day, second, last)
+
+        return xu.open_mfcesm(
+            self._fullname[sel].tolist(), varnames=varnames, chunks=chunks, **kwargs
+        )
+
     @staticmethod
     def __get_sel_single__(sel, data, condition):
         """
@@ -0,0 +1,375 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from .post import _mkdir, _write_atomic
+
+# increase if the layout of the inventory file changes
+_INVENTORY_VERSION = 1
+
+# do not persist listings of folders that were modified very recently - the
+# mtime of some file systems has a resolution of one second
+_MIN_AGE = 2
+
+_FIELDS = ("filename", "hist", "year", "month", "day", "second")
+
+
+def _inventory_file(post_file, folder_hist):
+    """name of the inventory file of a history folder
+
+    The inventory is saved in the post folder of the component, unless the
+    environment variable CESM_INVENTORY_CACHE names another folder (e.g. for
+    read-only post folders or the tests).
+
+    Parameters
+    ----------
+    post_file : str
+        Name of the inventory file in the post folder.
+    folder_hist : str
+        Folder of the history files.
+    """
+
+    folder = os.environ.get("CESM_INVENTORY_CACHE")
+
+    if folder is None:
+        return post_file
+
+    # the name of the run is not unique - add a hash of the history folder
+    key = hashlib.sha1(folder_hist.encode()).hexdigest()[:16]
+
+    return os.path.join(folder, f"{key}.{os.path.basename(post_file)}")
+
+
+# -----------------------------------------------------------------------------
+
+
+# end of the file names that can be parsed without regular expression:
+# "d" denotes a digit, followed by the fields and their number of digits
+_TAILS = [
+    (".dddd-dd.nc", [("year", 4), ("month", 2)]),
+    (".dddd-dd-dd.nc", [("year", 4), ("month", 2), ("day", 2)]),
+    (".dddd-dd-dd-ddddd.nc", [("year", 4), ("month", 2), ("day", 2), ("second", 5)]),
+]
+
+
+def _parse_hist_files(hfiles, re_str, prefix):
+    """parse history file names (vectorized)
+
+    File names that consist of the prefix, the name of the history stream
+    and a date with one of the formats in ``_TAILS`` are parsed using array
+    operations on the characters of all names at once. All other names
+    (e.g. zipped files) are parsed with the regular expression.
+
+    Parameters
+    ----------
+    hfiles : list of str
+        Sorted names of the files in the history folder.
+    re_str : compiled regular expression
+        See ``_comp.__get_re_string__``.
+    prefix : str
+        Name of the run and module including the trailing dot
+        (e.g. 'name.clm2.').
+
+    Returns
+    -------
+    inventory : dict of arrays
+        filename, hist, year, month, day, second of all matching files.
+    is_zipped : str
+        File ending of the first zipped file ("" if none is zipped).
+
+    See Also
+    --------
+    _parse_hist_files_re
+    """
+
+    names = np.array(hfiles, dtype=str)
+    n = names.size
+
+    if n == 0:
+        return _parse_hist_files_re(hfiles, re_str)
+
+    # unicode code point of every character (padded with 0)
+    width = names.dtype.itemsize // 4
+    codes = names.view(np.uint32).reshape(n, width)
+    # file names can not contain null characters
+    length = np.count_nonzero(codes, axis=1)
+
+    p = len(prefix)
+
+    # the last characters of all names (right-aligned), transposed such that
+    # every character position is contiguous in memory
+    k_max = max(len(tail) for tail, _ in _TAILS)
+    pos = np.maximum(length[:, np.newaxis] - k_max + np.arange(k_max), 0)
+    end = np.take_along_axis(codes, pos, axis=1).T.astype(np.int32)
+
+    digits = end - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+
+    fields = dict(
+        year=np.zeros(n, int),
+        month=np.zeros(n, int),
+        day=np.ones(n, int),
+        second=np.zeros(n, int),
+    )
+
+    matched = np.zeros(n, dtype=bool)
+    hist_end = np.zeros(n, dtype=int)
+
+    if width >= p:
+        prefix_codes = np.array([prefix], dtype=f"<U{max(p, 1)}").view(np.uint32)
+        has_prefix = np.all(codes[:, :p] == prefix_codes[:p], axis=1)
+    else:
+        has_prefix = np.zeros(n, dtype=bool)
+
+    for tail, tail_fields in _TAILS:
+
+        k = len(tail)
+        ok = has_prefix & (length >= p + k)
+
+        # position of the first character of the tail
+        s = k_max - k
+
+        for i, c in enumerate(tail, start=s):
+            if c == "d":
+                ok &= is_digit[i]
+            else:
+                ok &= end[i] == ord(c)
+
+        # convert consecutive digits to numbers (skip the separators)
+        i = s + 1
+        for field, n_digits in tail_fields:
+            value = 10 ** np.arange(n_digits)[::-1] @ digits[i : i + n_digits]
+            fields[field][ok] = value[ok]
+            i += n_digits + 1
+
+        hist_end[ok] = length[ok] - k
+        matched |= ok
+
+    # e.g. only zipped files or only 'rpointer.lnd' - the names may be shorter
+    # than the prefix, such that the stream names can not be extracted below
+    if not matched.any():
+        return _parse_hist_files_re(hfiles, re_str)
+
+    # extract the name of the history stream: blank everything after it
+    n_hist = hist_end - p
+    max_hist = max(int(n_hist[matched].max(initial=0)), 1)
+
+    hist_codes = codes[:, p : p + max_hist].copy()
+    hist_codes[np.arange(max_hist) >= n_hist[:, np.newaxis]] = 0
+    hist_codes[hist_codes == ord(".")] = ord("_")
+
+    hist = np.ascontiguousarray(hist_codes).view(f"<U{max_hist}").ravel()
+
+    # parse the remaining names with the regular expression
+    is_zipped = ""
+    for i in np.flatnonzero(~matched):
+        match = _match_re(hfiles[i], re_str)
+
+        if match:
+            # make sure the name of the stream fits
+            if len(match[0]) > hist.dtype.itemsize // 4:
+                hist = hist.astype(f"<U{len(match[0])}")
+
+            hist[i] = match[0]
+            for field, value in zip(["year", "month", "day", "second"], match[1:5]):
+                fields[field][i] = value
+
+            matched[i] = True
+
+            if not is_zipped:
+                is_zipped = match[5]
+
+    if not matched.all():
+        names, hist = names[matched], hist[matched]
+        fields = {field: value[matched] for field, value in fields.items()}
+
+    inventory = dict(filename=names, hist=hist, **fields)
+
+    return inventory, is_zipped
+
+
+# -----------------------------------------------------------------------------
+
+
+def _match_re(h, re_str):
+    """parse one history file name with the regular expression
+
+    Returns
+    -------
+    match : tuple or None
+        (hist, year, month, day, second, zip) or None if h does not match.
+    """
+
+    reg = re_str.search(h)
+
+    if not reg:
+        return None
+
+    hist = reg.group("hist").replace(".", "_")
+
+    # replace None
+    day = reg.group("day") if reg.group("day") else "1"
+    second = reg.group("second") if reg.group("second") else "0"
+
+    return (
+        hist,
+        int(reg.group("year")),
+        int(reg.group("month")),
+        int(day),
+        int(second),
+        reg.group("zip"),
+    )
+
+
+# -----------------------------------------------------------------------------
+
+
+def _parse_hist_files_re(hfiles, re_str):
+    """parse history file names with a regular expression (one at a time)
+
+    Parameters
+    ----------
+    hfiles : list of str
+        Sorted names of the files in the history folder.
+    re_str : compiled regular expression
+        See ``_comp.__get_re_string__``.
+
+    Returns
+    -------
+    inventory : dict of arrays
+        filename, hist, year, month, day, second of all matching files.
+    is_zipped : str
+        File ending of the first zipped file ("" if none is zipped).
+    """
+
+    # create empty lists
+    filename, hist = [], []
+    year, month, day, second = [], [], [], []
+
+    is_zipped = ""
+    for h in hfiles:
+
+        # find files that match
+        match = _match_re(h, re_str)
+
+        if match:
+
+            filename.append(h)
+            hist.append(match[0])
+            year.append(match[1])
+            month.append(match[2])
+            day.append(match[3])
+            second.append(match[4])
+
+            if not is_zipped:
+                is_zipped = match[5]
+
+    inventory = dict(
+        filename=np.array(filename, dtype=str),
+        hist=np.array(hist, dtype=str),
+        year=np.array(year, dtype=int),
+        month=np.array(month, dtype=int),
+        day=np.array(day, dtype=int),
+        second=np.array(second, dtype=int),
+    )
+
+    return inventory, is_zipped
+
+
+# -----------------------------------------------------------------------------
+
+
+def _read_inventory(fN, folder_hist, prefix):
+    """read the cached inventory of a history folder
+
+    Parameters
+    ----------
+    fN : str
+        Name of the inventory file.
+    folder_hist : str
+        Folder of the history files. The inventory is only valid if the
+        modification time of this folder did not change.
+    prefix : str
+        Name of the run and module (e.g. 'name.clm2').
+
+    Returns
+    -------
+    inventory : dict or None
+        The cached inventory (see ``_parse_hist_files_re``) with the additional
+        keys 'histfiles', 'is_zipped' and 'mtime'. None if there is no valid
+        cache.
+    """
+
+    if not os.path.isfile(fN):
+        return None
+
+    try:
+        mtime = os.stat(folder_hist).st_mtime_ns
+
+        with np.load(fN) as npz:
+            cached = {key: npz[key] for key in npz.files}
+    except (OSError, ValueError):
+        # unreadable or corrupt file - rescan the folder
+        return None
+
+    # the folder was modified or the cache belongs to another configuration
+    if (
+        cached["version"] != _INVENTORY_VERSION
+        or cached["mtime"] != mtime
+        or cached["prefix"] != prefix
+    ):
+        return None
+
+    inventory = {key: cached[key] for key in _FIELDS}
+    inventory["histfiles"] = cached["histfiles"]
+    inventory["is_zipped"] = str(cached["is_zipped"])
+    inventory["mtime"] = int(mtime)
+
+    return inventory
+
+
+# -----------------------------------------------------------------------------
+
+
+def _write_inventory(fN, inventory, prefix):
+    """persist the inventory of a history folder
+
+    Silently skipped if the post folder can not be written to or if the
+    history folder was modified very recently.
+
+    Parameters
+    ----------
+    fN : str
+        Name of the inventory file.
+    inventory : dict
+        Inventory with the keys 'histfiles', 'is_zipped', 'mtime' and
+        those of ``_parse_hist_files_re``.
+    prefix : str
+        Name of the run and module (e.g. 'name.clm2').
+    """
+
+    mtime = inventory["mtime"]
+
+    if time.time() - mtime / 1e9 < _MIN_AGE:
+        return
+
+    arrays = {key: inventory[key] for key in _FIELDS}
+
+    arrays["histfiles"] = np.asarray(inventory["histfiles"], dtype=str)
+    arrays["is_zipped"] = inventory["is_zipped"]
+    arrays["mtime"] = mtime
+    arrays["prefix"] = prefix
+    arrays["version"] = _INVENTORY_VERSION
+
+    def _write(tmp):
+        # savez_compressed appends '.npz' to file names
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
+    try:
+        _mkdir(os.path.dirname(fN))
+        _write_atomic(fN, _write)
+    except OSError:
+        pass
@@ -1,3 +1,4 @@
+import json
 import os
 from os import path
 
@@ -67,3 +68,40 @@ def _mkdir(directory):
         os.makedirs(directory)
     except OSError:
         pass
+
+
+def _write_atomic(fN, write, suffix=""):
+    """
+    write a file such that concurrent readers never see a partial file
+
+    Parameters
+    ----------
+    fN : str
+        Name of the file.
+    write : callable
+        Function that writes the content to the file name passed to it (a
+        temporary file in the same folder that replaces fN when done).
+    suffix : str, optional
+        Ending of the temporary file, for writers that append one to the
+        file name (e.g. scipy.sparse.save_npz).
+    """
+
+    tmp = f"{fN}.{os.getpid()}.tmp{suffix}"
+
+    try:
+        write(tmp)
+        os.replace(tmp, fN)
+    except BaseException:
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_json(fN, obj):
+    """atomically save a JSON serializable object, see _write_atomic"""
+
+    def _write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(obj, f, indent=1)
+
+    _write_atomic(fN, _write)
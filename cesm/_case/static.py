@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import xarray as xr
+
+from cesm.utils import xarray_utils as xu
+
+from .post import _mkdir, _write_atomic, _write_json
+
+# increase if the layout of the static files changes
+_STATIC_VERSION = 3
+
+# folder of the static fields shared by all cases, can be set with the
+# environment variable CESM_GRID_CACHE
+_DEFAULT_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "cesm", "grids")
+
+
+def _grid_cache_folder():
+    """folder of the cached static fields of all grids"""
+
+    return os.environ.get("CESM_GRID_CACHE", _DEFAULT_FOLDER)
+
+
+def _grid_hash(ds):
+    """
+    short hash of the content of the static fields
+
+    Only numeric and bytes arrays are hashed - the bytes of object arrays
+    (e.g. cftime) are pointers and differ between processes.
+    """
+
+    h = hashlib.sha1()
+
+    for name in sorted(ds.variables):
+        arr = np.ascontiguousarray(ds[name].values)
+
+        if arr.dtype.kind not in "biufcS":
+            continue
+
+        h.update(name.encode())
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+
+    return h.hexdigest()[:16]
+
+
+# -----------------------------------------------------------------------------
+
+
+def _get_static(h0, fields, comp):
+    """
+    the static fields (grid, area, ...) of a case
+
+    All fields are read from the first history file in one open and saved
+    to '<comp>.<resolution>.<grid hash>.nc' in the grid cache folder (see
+    _grid_cache_folder), so cases on the same grid share one file. A pointer
+    in the post folder of the case ('<...>.grid.json') refers to this file,
+    such that further lookups (also in other processes) do not touch the
+    history files.
+
+    Parameters
+    ----------
+    h0 : cesm hist class
+        The h0 history files of the component.
+    fields : list of str
+        Names of the static fields, missing fields are ignored.
+    comp : str
+        Name of the component (e.g. 'lnd').
+
+    Returns
+    -------
+    static : xarray Dataset
+        The static fields (loaded).
+    key : tuple of str
+        Component, resolution and grid hash - identifies the grid.
+    """
+
+    pointer = h0.post.pre_suf(suffix="grid", file_type="json")
+
+    static, key = _read_static(pointer)
+    if static is not None:
+        return static, key
+
+    with xu.open_cesm(h0[0]) as ds:
+        present = [name for name in fields if name in ds.variables]
+        static = _select_static(ds[present]).load()
+
+    key = (comp, h0.casedef.get("resolution", "unknown"), _grid_hash(static))
+    fN = os.path.join(_grid_cache_folder(), ".".join(key) + ".nc")
+
+    _write_static(fN, pointer, static, key)
+
+    return static, key
+
+
+def _select_static(ds):
+    """
+    remove the time dependence of the static fields
+
+    Time-dependent fields (e.g. LANDFRAC of CAM) are taken from the first time
+    step. Coordinates that depend on time do not describe the grid and are
+    dropped, such that the grid hash does not depend on the start of the case.
+    """
+
+    if "time" not in ds.dims:
+        return ds
+
+    time_coords = [name for name, coord in ds.coords.items() if "time" in coord.dims]
+
+    return ds.drop_vars(time_coords).isel(time=0)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _read_static(pointer):
+    """
+    read the static fields the pointer refers to and the key of the grid
+
+    Returns None, None if not possible.
+    """
+
+    if not os.path.isfile(pointer):
+        return None, None
+
+    try:
+        with open(pointer) as f:
+            info = json.load(f)
+
+        if info.get("version") != _STATIC_VERSION:
+            return None, None
+
+        return xr.load_dataset(info["file"]), tuple(info["key"])
+    except (OSError, ValueError, KeyError):
+        # e.g. the cache folder was cleaned - read the history file again
+        return None, None
+
+
+def _write_static(fN, pointer, static, key):
+    """
+    save the static fields and the pointer
+
+    Silently skipped if the folders can not be written to.
+    """
+
+    try:
+        # the file name contains the hash of its content - written once
+        if not os.path.isfile(fN):
+            _mkdir(os.path.dirname(fN))
+            _write_atomic(fN, static.to_netcdf)
+
+        _mkdir(os.path.dirname(pointer))
+        _write_json(pointer, dict(version=_STATIC_VERSION, file=fN, key=key))
+
+    except OSError:
+        pass
@@ -0,0 +1,271 @@
+import json
+import os
+from functools import partial
+
+import numpy as np
+import xarray as xr
+
+from cesm.utils import xarray_utils as xu
+
+from .._case.post import _write_atomic
+from .load import _check_all_files_exist, _provenance, _run_tasks
+
+# increase if the layout of the state file changes
+_STATE_VERSION = 1
+
+# attribute of the state file with the provenance of every year
+_PROVENANCE = "cesm_provenance"
+
+
+def _state_name(hist, varname):
+    """
+    construct the full name of the accumulator state of a variable
+    """
+
+    return hist.post.pre_suf(["clim_monthly", varname], "state", prefix_folder=True)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _clim_monthly(
+    hist,
+    varname,
+    year,
+    variance=False,
+    check_age=False,
+    processes=1,
+    executor=None,
+    callback=None,
+):
+    """
+    monthly climatology from running accumulators
+
+    Walks the history files of every year once and keeps the count, mean
+    and the sum of squared deviations (M2) of every month and gridcell.
+    The accumulators of the years are combined with the parallel algorithm
+    of Chan et al. The state is saved in the post folder together with the
+    provenance of every year, so extending the period only reads the new
+    years.
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varname : str
+        Name of the variable.
+    year : None | int | slice
+        Select year. See load._postprocess.
+    variance : bool, optional
+        If True, also return the variance ('<varname>_var', ddof=0) of every
+        month. Default: False.
+    check_age, processes, executor, callback
+        See load._postprocess. With check_age the state is computed again
+        if the history files of any year in the state changed.
+
+    Returns
+    -------
+    clim : xarray Dataset
+        The mean (and variance) of every month.
+
+    ..Note::
+      If the state contains years that are not requested, the requested
+      years are computed from scratch and replace the state.
+    """
+
+    fN = _state_name(hist, varname)
+
+    # list of years we want to process
+    years = [int(y) for y in np.unique(hist.year[hist._get_sel(year=year)])]
+
+    state, provenance = _read_state(fN)
+
+    if set(provenance) - set(years):
+        state, provenance = None, dict()
+
+    if check_age and any(
+        provenance[y] != _year_provenance(hist, y, varname) for y in provenance
+    ):
+        state, provenance = None, dict()
+
+    tasks = dict()
+    for y in years:
+        if y in provenance:
+            continue
+
+        source_files = hist.sel(year=y)
+        _check_all_files_exist(source_files)
+
+        tasks[y] = dict(source_files=source_files, hist=hist, varname=varname)
+
+    if tasks:
+        print(str(len(tasks)) + " years require reading")
+
+        msg = f"accumulating variable: {varname} in {{}}"
+
+        # the merged state, modified by _on_result
+        merged = dict(state=state)
+
+        def _on_result(y, result):
+            merged["state"] = _merge(merged["state"], result)
+            provenance[y] = _year_provenance(hist, y, varname)
+
+        try:
+            _run_tasks(
+                _accumulate_year,
+                tasks,
+                msg,
+                processes,
+                executor,
+                callback,
+                on_result=_on_result,
+            )
+        finally:
+            # keep the years that are done, also on errors
+            if merged["state"] is not None:
+                _write_state(fN, merged["state"], provenance)
+
+        state = merged["state"]
+
+    return _climatology(state, varname, variance)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _year_provenance(hist, year, varname):
+    """provenance of the accumulator of one year"""
+
+    return _provenance(hist.sel(year=year), varname, None, _accumulate_year, [varname])
+
+
+def _accumulate_year(source_files, hist, varname):
+    """
+    accumulators of the history files of one year
+
+    Parameters
+    ----------
+    source_files : list of str
+        The history files of one year.
+    hist : cesm hist class or tuple
+        Not used (see load._run_tasks).
+    varname : str
+        Name of the variable.
+
+    Returns
+    -------
+    state : xarray Dataset
+        See _accumulate.
+    """
+
+    state = None
+    for ds in xu.iter_netcdfs_cesm(source_files, variables=[varname]):
+        state = _merge(state, _accumulate(ds[varname]))
+
+    return state
+
+
+# -----------------------------------------------------------------------------
+
+
+def _accumulate(da):
+    """
+    count, mean and M2 of every month (NaN are skipped)
+
+    Returns
+    -------
+    state : xarray Dataset
+        With the variables 'count', 'mean' and 'M2' and the dimension
+        'month' (1 to 12, count is 0 for months without data).
+    """
+
+    months = da.time.dt.month
+
+    count = da.groupby(months).count("time")
+    mean = da.groupby(months).mean("time")
+    M2 = ((da.groupby(months) - mean) ** 2).groupby(months).sum("time")
+
+    state = xr.Dataset(dict(count=count, mean=mean, M2=M2))
+
+    # fill 0 for all months and gridcells without data
+    state = state.reindex(month=np.arange(1, 13)).fillna(0)
+
+    return state.assign(count=state["count"].astype("int32"))
+
+
+def _merge(a, b):
+    """
+    combine two accumulators (Chan et al.)
+
+    Parameters
+    ----------
+    a, b : xarray Dataset or None
+        See _accumulate. None is an empty accumulator.
+    """
+
+    if a is None:
+        return b
+
+    count = a["count"] + b["count"]
+    delta = b["mean"] - a["mean"]
+
+    # fraction of b in the combined accumulator
+    frac = (b["count"] / count.where(count > 0)).fillna(0)
+
+    mean = a["mean"] + delta * frac
+    M2 = a["M2"] + b["M2"] + delta**2 * a["count"] * frac
+
+    return xr.Dataset(dict(count=count, mean=mean, M2=M2))
+
+
+def _climatology(state, varname, variance):
+    """the mean (and variance) of every month from the accumulators"""
+
+    valid = state["count"] > 0
+
+    clim = xr.Dataset({varname: state["mean"].where(valid)})
+
+    if variance:
+        clim[f"{varname}_var"] = (state["M2"] / state["count"]).where(valid)
+
+    return clim
+
+
+# -----------------------------------------------------------------------------
+
+
+def _read_state(fN):
+    """
+    read the accumulators and the provenance of every year
+
+    Returns None and an empty dict if the state does not exist or can not
+    be read.
+    """
+
+    if not os.path.isfile(fN):
+        return None, dict()
+
+    try:
+        state = xr.load_dataset(fN)
+        attrs = json.loads(state.attrs.pop(_PROVENANCE))
+    except (OSError, ValueError, KeyError):
+        return None, dict()
+
+    if attrs.get("version") != _STATE_VERSION:
+        return None, dict()
+
+    provenance = {int(y): p for y, p in attrs["years"].items()}
+
+    return state, provenance
+
+
+def _write_state(fN, state, provenance):
+    """save the accumulators and the provenance of every year"""
+
+    attrs = dict(
+        version=_STATE_VERSION, years={str(y): p for y, p in provenance.items()}
+    )
+
+    state = state.assign_attrs({_PROVENANCE: json.dumps(attrs)})
+
+    _write_atomic(fN, partial(state.to_netcdf, format="NETCDF4_CLASSIC"))
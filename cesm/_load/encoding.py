@@ -0,0 +1,153 @@
+import numpy as np
+
+# options of zlib compression in the presets
+_ZLIB = dict(zlib=True, complevel=4, shuffle=True)
+
+# encoding presets for the postprocessed files - see _encoding
+ENCODING_PRESETS = {
+    # uncompressed
+    "none": dict(zlib=False),
+    # compressed, the chunks are chosen by the netCDF library
+    "zlib": dict(**_ZLIB),
+    # fast to read all time steps at a location (e.g. regional means)
+    "timeseries": dict(**_ZLIB, chunks="timeseries"),
+    # fast to read a full field at one time step
+    "map": dict(**_ZLIB, chunks="map"),
+    # like "timeseries", but floats are saved as float32
+    "float32": dict(**_ZLIB, chunks="timeseries", dtype="float32"),
+}
+
+# size of the spatial tiles of "timeseries" chunks
+_TILE = 32
+
+# encoding of the source files kept when a policy is applied - see _encoding
+_SOURCE_KEYS = (
+    "dtype",
+    "_FillValue",
+    "missing_value",
+    "scale_factor",
+    "add_offset",
+    "zlib",
+    "complevel",
+    "shuffle",
+    "fletcher32",
+    "contiguous",
+    "chunksizes",
+)
+
+
+def _get_policy(encoding):
+    """
+    get the encoding policy from a preset or a dict
+
+    Parameters
+    ----------
+    encoding : None | str | dict
+        None (keep the encoding of the source files) or the name of one of
+        the ENCODING_PRESETS or a dict with (any of) the keys:
+
+        - zlib, complevel, shuffle: compression, see netCDF4.
+        - chunks: "timeseries", "map" or a dict of chunk sizes per dim.
+        - dtype: e.g. "float32", floating point variables are converted.
+    """
+
+    if encoding is None:
+        return dict()
+
+    if isinstance(encoding, str):
+        if encoding not in ENCODING_PRESETS:
+            presets = "', '".join(ENCODING_PRESETS)
+            msg = f"encoding ('{encoding}') must be any of: '{presets}'"
+            raise KeyError(msg)
+
+        return ENCODING_PRESETS[encoding]
+
+    return encoding
+
+
+# -----------------------------------------------------------------------------
+
+
+def _encoding(ds, encoding):
+    """
+    encoding of every data variable of ds for to_netcdf
+
+    The policy is merged into the encoding the variables have from the source
+    files (e.g. compression, _FillValue and missing_value), such that the
+    encoding is only changed where the policy says so.
+
+    Parameters
+    ----------
+    ds : xarray Dataset
+        Dataset to save.
+    encoding : None | str | dict
+        Encoding policy, see _get_policy.
+
+    Returns
+    -------
+    encoding : dict or None
+        Encoding per variable, passed to to_netcdf. None if the policy is
+        empty (keeps the encoding of the source files).
+    """
+
+    policy = dict(_get_policy(encoding))
+
+    if not policy:
+        return None
+
+    chunks = policy.pop("chunks", None)
+    dtype = policy.pop("dtype", None)
+
+    result = dict()
+    for name, da in ds.data_vars.items():
+
+        enc = _source_encoding(da)
+        enc.update(policy)
+
+        if dtype is not None and np.issubdtype(da.dtype, np.floating):
+            enc["dtype"] = dtype
+
+        chunksizes = _chunksizes(da, chunks)
+        if chunksizes is not None:
+            enc["chunksizes"] = chunksizes
+            enc.pop("contiguous", None)
+
+        result[name] = enc
+
+    return result
+
+
+def _source_encoding(da):
+    """the encoding of da that is valid for to_netcdf"""
+
+    enc = {key: da.encoding[key] for key in _SOURCE_KEYS if key in da.encoding}
+
+    # the chunks of the source file do not fit if the shape changed
+    chunksizes = enc.get("chunksizes")
+    if chunksizes is not None and (
+        da.encoding.get("original_shape", da.shape) != da.shape
+        or any(c > size for c, size in zip(chunksizes, da.shape))
+    ):
+        del enc["chunksizes"]
+
+    return enc
+
+
+def _chunksizes(da, chunks):
+    """chunk size along every dimension of da (None for the default)"""
+
+    # netCDF only chunks variables with at least one dimension
+    if chunks is None or da.ndim == 0:
+        return None
+
+    if chunks == "timeseries":
+        # all time steps in one chunk, spatial tiles
+        chunks = {dim: _TILE for dim in da.dims if dim != "time"}
+    elif chunks == "map":
+        # one time step per chunk
+        chunks = {"time": 1}
+    elif not isinstance(chunks, dict):
+        msg = "chunks must be 'timeseries', 'map' or a dict"
+        raise ValueError(msg)
+
+    return tuple(min(chunks.get(dim, size), size) for dim, size in da.sizes.items())
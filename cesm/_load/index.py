@@ -0,0 +1,76 @@
+import json
+import os
+
+# increase if the layout of the index file changes
+_INDEX_VERSION = 1
+
+
+def _file_info(fN):
+    """size and modification time of a file (None if it does not exist)"""
+
+    try:
+        stat = os.stat(fN)
+    except OSError:
+        return None
+
+    return dict(size=stat.st_size, mtime=int(stat.st_mtime))
+
+
+# -----------------------------------------------------------------------------
+
+
+def _read_index(fN):
+    """
+    read the index of the consolidated files of a variable
+
+    Returns
+    -------
+    index : dict
+        With the key 'files': list of dict with the keys 'filename' (without
+        folder), 'years' and 'sources' (the _file_info of the yearly file of
+        every year). Empty if the index does not exist or can not be read.
+    """
+
+    empty = dict(version=_INDEX_VERSION, files=[])
+
+    if not os.path.isfile(fN):
+        return empty
+
+    try:
+        with open(fN) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return empty
+
+    if index.get("version") != _INDEX_VERSION:
+        return empty
+
+    return index
+
+
+# -----------------------------------------------------------------------------
+
+
+def _is_fresh(entry, yearly_files):
+    """
+    check if a consolidated file still corresponds to its yearly files
+
+    Parameters
+    ----------
+    entry : dict
+        Entry of the index, see _read_index.
+    yearly_files : dict
+        Name of the yearly file of every year.
+
+    ..Note::
+      Yearly files that were removed after consolidating are considered
+      unchanged.
+    """
+
+    for year, info in entry["sources"].items():
+        current = _file_info(yearly_files[int(year)])
+
+        if current is not None and current != info:
+            return False
+
+    return True
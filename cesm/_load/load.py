@@ -1,18 +1,95 @@
-import multiprocessing as _multiprocessing
 import os as _os
+from concurrent.futures import ProcessPoolExecutor as _ProcessPoolExecutor
+from concurrent.futures import as_completed as _as_completed
+from functools import lru_cache as _lru_cache
+from functools import partial as _partial
 
 import numpy as np
-import pandas as pd
 import xarray as xr
 from scipy import stats as _stats
 
 from cesm.utils import xarray_utils as xu
 
+from .._case.case import case as _case
+from .._case.post import _write_atomic, _write_json
+from .encoding import ENCODING_PRESETS  # noqa: F401
+from .encoding import _encoding, _get_policy
+from .index import _file_info, _is_fresh, _read_index
+from .provenance import _is_stale, _provenance, _write_provenance
+from .regions import (
+    _region_weights,
+    _regional_mean,
+    _regions_name,
+    _srex_land_weights,
+)
+from .soil import _soil_layers, _soil_weights
+
+
+def var(
+    hist, varname, year, processes=1, executor=None, encoding=None, backend="netcdf"
+):
+    """
+    postprocess and load a variable
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varname : str
+        Name of the variable.
+    year : None | int | slice
+        Select year. See _postprocess.
+    processes, executor, encoding : optional
+        See _postprocess. encoding is only supported by the netcdf backend.
+        If the years were merged with consolidate, these files are read
+        instead (netcdf backend).
+    backend : 'netcdf' | 'zarr', optional
+        Save the years in one netCDF file per year ('netcdf') or in one zarr
+        store per variable ('zarr', requires zarr). The zarr store is opened
+        lazily. Default: 'netcdf'.
+
+    Returns
+    -------
+    ds : xarray Dataset
+        The variable.
+    """
+
+    if backend == "zarr":
+
+        if encoding is not None:
+            raise ValueError("encoding is not supported by the zarr backend")
+
+        # avoid circular import
+        from .zarr_backend import _open_zarr, _postprocess_zarr
+
+        store, years = _postprocess_zarr(
+            hist, _output(varname), year, processes=processes, executor=executor
+        )
 
-def var(hist, varname, year, processes=1):
+        return _open_zarr(store, years)
+
+    if backend != "netcdf":
+        msg = f"backend must be 'netcdf' or 'zarr', found: '{backend}'"
+        raise ValueError(msg)
+
+    # use the consolidated files if they contain all years
+    years = np.unique(hist.year[hist._get_sel(year=year)])
+    consolidated_files = _consolidated_files(hist, _prefix("", varname), years)
+
+    if consolidated_files is not None:
+        ds = xu.read_netcdfs_cesm(consolidated_files, "time")
+        return ds.sel(time=ds["time.year"].isin(years))
 
     source_files = _postprocess(
-        hist, varname, year=year, force_save=False, check_age=False, processes=processes
+        hist,
+        varname,
+        year=year,
+        force_save=False,
+        check_age=False,
+        processes=processes,
+        executor=executor,
+        encoding=encoding,
+        years=years,
     )
 
     return xu.read_netcdfs_cesm(source_files, "time")
@@ -21,17 +98,101 @@ def var(hist, varname, year, processes=1):
 # -----------------------------------------------------------------------------
 
 
-def clim_monthly(hist, varname, year):
+def vars(hist, varnames, year, processes=1, executor=None, encoding=None):
+    """
+    postprocess several variables, reading the history files only once
 
-    ds = var(hist, varname, year)
+    Like calling var for every variable, but every year of the history
+    files is read once for all variables.
 
-    return ds.groupby("time.month").mean(dim="time")
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varnames : list of str
+        Names of the variables.
+    year : None | int | slice
+        Select year. See _postprocess.
+    processes, executor, encoding : optional
+        See _postprocess.
+
+    Returns
+    -------
+    ds : xarray Dataset
+        All variables.
+    """
+
+    varnames = _str2lst(varnames)
+
+    outputs = [_output(varname) for varname in varnames]
+
+    dest_files = _postprocess_outputs(
+        hist, outputs, year, processes=processes, executor=executor, encoding=encoding
+    )
+
+    return xr.merge([xu.read_netcdfs_cesm(fNs, "time") for fNs in dest_files])
 
 
 # -----------------------------------------------------------------------------
 
 
-def evapotranspiration(hist, varname="ET", year=None, processes=1):
+def clim_monthly(
+    hist,
+    varname,
+    year,
+    variance=False,
+    check_age=False,
+    processes=1,
+    executor=None,
+):
+    """
+    monthly climatology of a variable
+
+    The history files of every year are read once and reduced to running
+    per-month accumulators (count, mean and sum of squared deviations).
+    The accumulators are saved in the post folder, extending the period
+    only reads the new years.
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varname : str
+        Name of the variable.
+    year : None | int | slice
+        Select year. See _postprocess.
+    variance : bool, optional
+        If True, also return the variance ('<varname>_var', ddof=0).
+        Default: False.
+    check_age, processes, executor : optional
+        See _postprocess.
+
+    Returns
+    -------
+    clim : xarray Dataset
+        The mean (and variance) of every month (dimension 'month').
+    """
+
+    # avoid circular import
+    from .climatology import _clim_monthly
+
+    return _clim_monthly(
+        hist,
+        varname,
+        year,
+        variance=variance,
+        check_age=check_age,
+        processes=processes,
+        executor=executor,
+    )
+
+
+# -----------------------------------------------------------------------------
+
+
+def evapotranspiration(
+    hist, varname="ET", year=None, processes=1, executor=None, encoding=None
+):
 
     transform_func_internal = _trans_evapotranspiration
 
@@ -46,7 +207,10 @@ def evapotranspiration(hist, varname="ET", year=None, processes=1):
         force_save=False,
         check_age=False,
         processes=processes,
+        executor=executor,
+        encoding=encoding,
         new_var=new_var,
+        variables=["QSOIL", "QVEGE", "QVEGT"],
     )
 
     return xu.read_netcdfs_cesm(source_files, "time")
@@ -55,7 +219,7 @@ def evapotranspiration(hist, varname="ET", year=None, processes=1):
 # -----------------------------------------------------------------------------
 
 
-def soillev(hist, varname, year, transform_func=None):
+def soillev(hist, varname, year, transform_func=None, encoding=None):
 
     prefix = "soillev"
     transform_func_internal = _trans_soilliq_soillev
@@ -69,6 +233,7 @@ def soillev(hist, varname, year, transform_func=None):
         new_var=None,
         force_save=False,
         check_age=False,
+        encoding=encoding,
     )
 
     return xu.read_netcdfs_cesm(fNs, "time", transform_func=transform_func)
@@ -77,7 +242,79 @@ def soillev(hist, varname, year, transform_func=None):
 # -----------------------------------------------------------------------------
 
 
-def var_SREX_LAND(hist, varname, year, force_save=False, check_age=False):
+def soil_layers(
+    hist,
+    varname,
+    year,
+    bounds,
+    weighting="DZSOI",
+    force_save=False,
+    check_age=False,
+    processes=1,
+    executor=None,
+    encoding=None,
+):
+    """
+    postprocess and load a soil variable aggregated to layers
+
+    The layer x levgrnd weight matrix is computed once from DZSOI/ ZSOI
+    and applied as one matrix product per history file.
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varname : str
+        Name of the variable, e.g. 'SOILLIQ'.
+    year : None | int | slice
+        Select year. See _postprocess.
+    bounds : list of float
+        Depth (m) of the boundaries of the layers, e.g. [0, 0.1, 1, 2.9]
+        for three layers.
+    weighting : 'DZSOI' | 'sum', optional
+        'DZSOI': depth-weighted mean over the layer. 'sum': sum over the
+        levels whose node depth lies in the layer (e.g. for kg/m2).
+        Default: 'DZSOI'.
+    force_save, check_age, processes, executor, encoding : optional
+        See _postprocess.
+
+    Returns
+    -------
+    ds : xarray Dataset
+        The variable with the dimension 'soillev' instead of 'levgrnd'.
+    """
+
+    bounds = tuple(float(b) for b in bounds)
+
+    name = "_".join(f"{b:g}" for b in bounds)
+    prefix = ["soil_layers", weighting, name]
+
+    # partial can be pickled, see _postprocess
+    transform_func = _partial(_trans_soil_layers, bounds=bounds, weighting=weighting)
+
+    fNs = _postprocess(
+        hist,
+        varname,
+        year,
+        prefix=prefix,
+        transform_func=transform_func,
+        new_var=None,
+        force_save=force_save,
+        check_age=check_age,
+        processes=processes,
+        executor=executor,
+        encoding=encoding,
+    )
+
+    return xu.read_netcdfs_cesm(fNs, "time")
+
+
+# -----------------------------------------------------------------------------
+
+
+def var_SREX_LAND(
+    hist, varname, year, force_save=False, check_age=False, encoding=None
+):
 
     prefix = "SREX"
     transform_func = _trans_SREX_LAND_var
@@ -91,6 +328,89 @@ def var_SREX_LAND(hist, varname, year, force_save=False, check_age=False):
         new_var=None,
         force_save=force_save,
         check_age=check_age,
+        encoding=encoding,
+    )
+
+    return xu.read_netcdfs_cesm(fNs, "time")
+
+
+# -----------------------------------------------------------------------------
+
+
+def var_regions(
+    hist,
+    varname,
+    year,
+    regions,
+    weighting="coslat_landfrac",
+    name=None,
+    force_save=False,
+    check_age=False,
+    processes=1,
+    executor=None,
+    encoding=None,
+):
+    """
+    postprocess and load the regional means of a variable
+
+    The region x gridcell weight matrix is computed once per grid, regions
+    and weighting and cached in the post folder. The means of all regions
+    are then computed in one matrix product per history file.
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varname : str
+        Name of the variable.
+    year : None | int | slice
+        Select year. See _postprocess.
+    regions : regionmask.Regions | str
+        Regions (e.g. regionmask.defined_regions.ar6.land) or the name of a
+        netCDF file with an integer mask on the grid of the case (NaN
+        outside of all regions). The mask file has one variable (or a
+        variable called 'mask'), the region names are read from the
+        'flag_values' and 'flag_meanings' attributes if present.
+    weighting : str, optional
+        Weight of the gridcells: 'coslat', 'coslat_landfrac', 'area' or
+        'area_landfrac'. Default: 'coslat_landfrac'.
+    name : str, optional
+        Name of the regions in the file names. Default: the name of the
+        regions or of the mask file.
+    force_save, check_age, processes, executor, encoding : optional
+        See _postprocess.
+
+    Returns
+    -------
+    ds : xarray Dataset
+        The regional means with the dimension 'region' and the coordinates
+        'abbrevs' and 'names'.
+    """
+
+    name = _regions_name(regions, name)
+    prefix = ["regions", name, weighting]
+
+    # error early for invalid regions or weighting and compute the cached
+    # weights before the years are saved (possibly in several processes)
+    _region_weights(hist, regions, weighting, name)
+
+    # partial can be pickled, see _postprocess
+    transform_func = _partial(
+        _trans_regions_var, regions=regions, weighting=weighting, name=name
+    )
+
+    fNs = _postprocess(
+        hist,
+        varname,
+        year,
+        prefix=prefix,
+        transform_func=transform_func,
+        new_var=None,
+        force_save=force_save,
+        check_age=check_age,
+        processes=processes,
+        executor=executor,
+        encoding=encoding,
     )
 
     return xu.read_netcdfs_cesm(fNs, "time")
@@ -99,11 +419,12 @@ def var_SREX_LAND(hist, varname, year, force_save=False, check_age=False):
 # -----------------------------------------------------------------------------
 
 
-def annual_resample(hist, varname, year, apply_func="mean"):
+def annual_resample(hist, varname, year, apply_func="mean", encoding=None):
 
     prefix = ["annual", apply_func]
 
-    transform_func = _trans_annual_resample(apply_func)
+    # partial can be pickled, see _postprocess
+    transform_func = _partial(_trans_annual_resample, apply_func=apply_func)
 
     fNs = _postprocess(
         hist,
@@ -114,11 +435,104 @@ def annual_resample(hist, varname, year, apply_func="mean"):
         new_var=None,
         force_save=False,
         check_age=False,
+        encoding=encoding,
     )
 
     return xu.read_netcdfs_cesm(fNs, "time")
 
 
+def consolidate(
+    hist, varname, year=None, years_per_file=10, prefix="", new_var=None, encoding=None
+):
+    """
+    merge the yearly files of a variable into multi-year files
+
+    The years are grouped into blocks of years_per_file (e.g. 2000-2009)
+    and saved as '<prefix>.<name>.<modname>.<hist>.<first>-<last>.nc'. An
+    index ('<...>.consolidated.json') records which years every file
+    contains and the size and modification time of the yearly files, blocks
+    whose yearly files did not change are skipped. var reads the
+    consolidated files if they contain all requested years.
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    varname : str
+        Name of the variable.
+    year : None | int | slice
+        Select year. See _postprocess. The yearly files of all years must
+        exist, e.g. created with var.
+    years_per_file : int | None, optional
+        Number of years per file. None saves all years into one file.
+        Default: 10.
+    prefix, new_var, encoding : optional
+        See _postprocess.
+
+    Returns
+    -------
+    fNs : list of str
+        The consolidated files.
+    """
+
+    if new_var is None:
+        new_var = varname
+
+    prefix = _prefix(prefix, new_var)
+
+    years = np.unique(hist.year[hist._get_sel(year=year)])
+
+    yearly_files = {year: _destfile_name(hist, prefix, year) for year in years}
+    _check_all_files_exist(list(yearly_files.values()))
+
+    index_file = _index_name(hist, prefix)
+    index = _read_index(index_file)
+
+    fNs = []
+    for block in _blocks(years, years_per_file):
+
+        fN = hist.post.pre_suf(prefix, f"{block[0]}-{block[-1]}", prefix_folder=True)
+        fNs.append(fN)
+
+        entry = dict(
+            filename=_os.path.basename(fN),
+            years=[int(year) for year in block],
+            sources={str(year): _file_info(yearly_files[year]) for year in block},
+        )
+
+        # nothing changed
+        if entry in index["files"] and _os.path.isfile(fN):
+            continue
+
+        print("consolidating {}..{}".format(block[0], block[-1]))
+
+        ds = xu.read_netcdfs_cesm([yearly_files[year] for year in block], "time")
+
+        to_netcdf = _partial(
+            ds.to_netcdf, format="NETCDF4_CLASSIC", encoding=_encoding(ds, encoding)
+        )
+        _write_atomic(fN, to_netcdf)
+
+        # replace the files containing any of these years
+        keep = []
+        folder = _os.path.dirname(fN)
+        for other in index["files"]:
+            if set(other["years"]).isdisjoint(entry["years"]):
+                keep.append(other)
+            elif other["filename"] != entry["filename"]:
+                other_file = _os.path.join(folder, other["filename"])
+                if _os.path.isfile(other_file):
+                    _os.remove(other_file)
+
+        index["files"] = sorted(keep + [entry], key=lambda e: e["years"][0])
+        _write_json(index_file, index)
+
+    return fNs
+
+
+# -----------------------------------------------------------------------------
+
+
 # ======================================================================
 # TRANSFORMATION FUNCTIONS
 # ======================================================================
@@ -159,48 +573,27 @@ def _trans_SREX_LAND_var(varname, hist):
     """
     calculate var for each SREX region and global land mean
 
+    The global, global land, global land w/o Antarctica and the SREX means
+    are computed in one pass with the weight matrix of the grid, see
+    regions._srex_land_weights.
     """
 
     # obtain necessary data
     import regionmask
 
-    landfrac = hist.data.landfrac
-    weight = hist.data.weight
-
-    wgt = landfrac * weight
-    mask = regionmask.defined_regions.srex.mask(landfrac, wrap_lon=True)
+    matrix = _srex_land_weights(hist)
 
     abbrevs = ["global", "global_land", "global_land_wo_antarctica"]
     abbrevs += regionmask.defined_regions.srex.abbrevs
 
     # extract a named variable
     def _inner(ds):
-        ds = ds[varname]
-
-        # global mean
-        ave = [ds.weighted(weight).mean(("lat", "lon"))]
-
-        # global land mean
-        a = ds.weighted(wgt).mean(("lat", "lon"))
-        ave.append(a)
-
-        # global land mean w/o antarctica
-        d = ds.sel(lat=slice(-60, 87))
-        a = d.weighted.mean(("lat", "lon"))
-        ave.append(a)
-
-        # srex mean
-        for i in range(1, 27):
-            a = ds.where(mask == i).weighted(wgt).mean(("lat", "lon"))
-
-            ave.append(a)
-
-        ds = xr.concat(ave, dim="srex")
+        ds = _regional_mean(ds[varname], matrix, dim="srex")
 
         # shift srex coordinates such that 1 to 26 corresponds to the
         # regions
         x = np.arange(-2, 27)
-        ds.srex.values[:] = x
+        ds = ds.assign_coords(srex=x)
 
         # add the name of the regions
         ds = ds.assign_coords(**{"srex_abbrev": ("srex", abbrevs)})
@@ -210,6 +603,37 @@ def _trans_SREX_LAND_var(varname, hist):
     return _inner
 
 
+# increase to recompute the saved files, see provenance._transform_version
+# 1: fixed global_land_wo_antarctica
+_trans_SREX_LAND_var.version = 1
+
+
+# -----------------------------------------------------------------------------
+
+
+def _trans_regions_var(varname, hist, regions, weighting, name):
+    """
+    transformation function to calculate the regional means of a variable
+
+    Parameters
+    ----------
+    regions, weighting, name
+        See var_regions.
+    """
+
+    matrix, numbers, abbrevs, names = _region_weights(hist, regions, weighting, name)
+
+    def _inner(ds):
+
+        ds = _regional_mean(ds[varname], matrix)
+
+        return ds.assign_coords(
+            region=numbers, abbrevs=("region", abbrevs), names=("region", names)
+        )
+
+    return _inner
+
+
 # -----------------------------------------------------------------------------
 
 
@@ -217,30 +641,35 @@ def _trans_soilliq_soillev(varname, hist):
     """
     transformation function to extract SOILLIQ/ ICE in three levels
 
-    split soil into three parts: 0 to 10 // 10 to 100 // 100 to 380 cm
+    split soil into three parts: 0 to 10 // 10 to 100 // 100 to 290 cm and
+    sum the levels in each part
     """
 
-    def _inner(ds):
+    return _trans_soil_layers(varname, hist, bounds=(0, 0.1, 1, 2.9), weighting="sum")
 
-        # only the 10 first levels
-        ds = ds[varname].isel(levgrnd=slice(None, 10))
 
-        # split levgrnd
-        soillev = pd.cut(ds.levgrnd, [0, 0.1, 1, 2.9])
+# increase to recompute the saved files, see provenance._transform_version
+# 1: levels selected with ZSOI, soillev is the second dimension
+_trans_soilliq_soillev.version = 1
 
-        # add the new category
-        ds = ds.assign_coords(soillev=("levgrnd", soillev))
 
-        # take sum over the three parts
-        ds = ds.groupby("soillev").sum(dim="levgrnd", skipna=False)
+# -----------------------------------------------------------------------------
 
-        # hack: turn pandas IntervalIndex to string
-        # soillev = ds.soillev.values
-        # soillev = [n.__str__() for n in soillev]
-        soillev = ["(0, 0.1]", "(0.1, 1]", "(1, 2.9]"]
-        ds.soillev.values[:] = soillev
 
-        return ds
+def _trans_soil_layers(varname, hist, bounds, weighting):
+    """
+    transformation function to aggregate a soil variable to layers
+
+    Parameters
+    ----------
+    bounds, weighting
+        See soil_layers.
+    """
+
+    weights = _soil_weights(hist.data, bounds, weighting)
+
+    def _inner(ds):
+        return _soil_layers(ds[varname], weights)
 
     return _inner
 
@@ -248,7 +677,7 @@ def _trans_soilliq_soillev(varname, hist):
 # -----------------------------------------------------------------------------
 
 
-def _trans_annual_resample(apply_func):
+def _trans_annual_resample(varname, hist, apply_func):
     """
     transformation function to extract annual mean, max, etc.
 
@@ -259,20 +688,17 @@ def _trans_annual_resample(apply_func):
         xarray's resample function.
     """
 
-    def _trans_annual_resample_internal(varname, hist):
-        def _inner(ds):
-
-            ds = ds[varname]
-            year = _stats.mode(ds["time.year"].values, keepdims=False).mode
-            ds = ds.sel(time=str(year))
-            resampler = ds.resample(time="A")
-            ds = getattr(resampler, apply_func)(keep_attrs=True)
+    def _inner(ds):
 
-            return ds
+        ds = ds[varname]
+        year = _stats.mode(ds["time.year"].values, keepdims=False).mode
+        ds = ds.sel(time=str(year))
+        resampler = ds.resample(time="A")
+        ds = getattr(resampler, apply_func)(keep_attrs=True)
 
-        return _inner
+        return ds
 
-    return _trans_annual_resample_internal
+    return _inner
 
 
 # =============================================================================
@@ -288,6 +714,11 @@ def _postprocess(
     force_save=False,
     check_age=False,
     processes=1,
+    variables=None,
+    executor=None,
+    callback=None,
+    encoding=None,
+    years=None,
 ):
     """
     generic function postprocessing/ saving all selected cesm files
@@ -311,101 +742,280 @@ def _postprocess(
     force_save : bool, optional
         If True, forces a (re-)save. Default: False.
     check_age : bool, optional
-        Check if source_files are younger than dest_file. If so,
-        re-save. Default: False.
+        Re-save the files whose source files, transform_func (name and
+        ``version`` attribute) or variables changed since they were saved.
+        Files without provenance are re-saved if any source file is
+        younger. Default: False.
     processes : int, optional
-        For multiprocessing.
+        Number of worker processes used to save the years. The pool is shut
+        down before returning. Default: 1 (no multiprocessing).
+    variables : list of str, optional
+        Variables read from the source files, all others are skipped. Must
+        contain all variables required by transform_func. Default: varname.
+    executor : concurrent.futures.Executor, optional
+        Executor to save the years, e.g. a ProcessPoolExecutor shared by
+        several calls. It is not shut down. Overrides processes.
+    callback : callable, optional
+        Called as ``callback(year, error)`` in the calling process as soon
+        as a year is saved (error is None) or failed.
+    encoding : None | str | dict, optional
+        Compression, chunking and data type of the saved files. One of
+        'none', 'zlib', 'timeseries' (chunks for reading all time steps at
+        a location), 'map' (chunks for reading full fields) and 'float32'
+        ('timeseries' as float32) or a dict, see encoding._get_policy.
+        Default: None (keep the encoding of the source files).
+    years : array of int, optional
+        The years selected by year, if they are already known. Avoids
+        selecting (and warning about empty selections) twice.
 
     Returns
     =======
     dest_files : list of strings
         List of all files that were selected.
 
+    ..Note::
+      The workers only receive the names of the files and of the case (not
+      the hist object) and rebuild the hist once per process.
+      transform_func must be picklable for multiprocessing (i.e. a module
+      level function or a functools.partial thereof).
+
+      If saving a year fails, the years not yet started are cancelled and
+      a RuntimeError is raised.
+
+    """
+
+    output = _output(varname, prefix, new_var, transform_func, variables)
+
+    (dest_files,) = _postprocess_outputs(
+        hist,
+        [output],
+        year,
+        force_save,
+        check_age,
+        processes,
+        executor,
+        callback,
+        encoding,
+        years,
+    )
+
+    return dest_files
+
 
+def _output(
+    varname, prefix="", new_var=None, transform_func=_trans_extract_var, variables=None
+):
+    """
+    describe one postprocessed variable, see _postprocess for the parameters
     """
 
     if new_var is None:
         new_var = varname
 
-    prefix = _prefix(prefix, new_var)
+    if variables is None:
+        variables = [varname]
+
+    return dict(
+        varname=varname,
+        new_var=new_var,
+        prefix=_prefix(prefix, new_var),
+        transform_func=transform_func,
+        variables=list(variables),
+    )
+
+
+def _postprocess_outputs(
+    hist,
+    outputs,
+    year,
+    force_save=False,
+    check_age=False,
+    processes=1,
+    executor=None,
+    callback=None,
+    encoding=None,
+    years=None,
+):
+    """
+    postprocess several variables, reading every year only once
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    outputs : list of dict
+        Description of the postprocessed variables, see _output.
+    year, force_save, check_age, processes, executor, callback, encoding, years
+        See _postprocess.
+
+    Returns
+    =======
+    dest_files : list of list of strings
+        List of all files that were selected, for each output.
+    """
+
+    # error early for invalid presets
+    _get_policy(encoding)
 
     # list of years we want to process
-    years = np.unique(hist.year[hist._get_sel(year=year)])
+    if years is None:
+        years = np.unique(hist.year[hist._get_sel(year=year)])
 
     # first and last years
     yearmin, yearmax = np.min(years), np.max(years)
 
     # created destination files
-    dest_files = []
+    dest_files = [[] for _ in outputs]
 
-    years_require_saving = []
+    # outputs that need to be saved per year
+    tasks = dict()
 
     # loop years
     for year in years:
 
         # name of source and destination files
         source_files = hist.sel(year=year)
-        dest_file = _destfile_name(hist, prefix, year)
 
-        dest_files.append(dest_file)
+        outputs_require_saving = []
+        for output, output_dest_files in zip(outputs, dest_files):
 
-        # do we need to save the file?
-        if _maybe_save(source_files, dest_file, force_save, check_age):
+            dest_file = _destfile_name(hist, output["prefix"], year)
+            output_dest_files.append(dest_file)
 
-            years_require_saving.append(year)
+            # do we need to save the file?
+            if _maybe_save(
+                source_files,
+                dest_file,
+                force_save,
+                check_age,
+                varname=output["varname"],
+                new_var=output["new_var"],
+                transform_func=output["transform_func"],
+                variables=output["variables"],
+            ):
+                outputs_require_saving.append(dict(output, dest_file=dest_file))
+
+        if outputs_require_saving:
 
             # check that all files exist or error
             _check_all_files_exist(source_files)
 
+            tasks[year] = dict(
+                source_files=source_files,
+                hist=hist,
+                outputs=outputs_require_saving,
+                encoding=encoding,
+            )
+
     # loop only years that need to be saved
-    if years_require_saving:
-        n_years_require_saving = len(years_require_saving)
-        print(str(n_years_require_saving) + " years require saving")
+    if tasks:
+        print(str(len(tasks)) + " years require saving")
 
-        # prepare for parallel processing
-        all_args = list()
-        for year in years_require_saving:
+        msg = "writing variable: {{}} in {}..{}".format(yearmin, yearmax)
 
-            msg = "writing variable: {} in {}..{}"
-            msg = msg.format(year, yearmin, yearmax)
+        _run_tasks(_save_vars, tasks, msg, processes, executor, callback)
 
-            # name of source and destination files
-            source_files = hist.sel(year=year)
-            dest_file = _destfile_name(hist, prefix, year)
+    return dest_files
 
-            # pack arguments
-            args = (
-                source_files,
-                dest_file,
-                varname,
-                hist,
-                new_var,
-                transform_func,
+
+def _run_tasks(
+    func, tasks, msg, processes=1, executor=None, callback=None, on_result=None
+):
+    """
+    call func for every year, in this process or in an executor
+
+    Parameters
+    ----------
+    func : function
+        Function saving one year, must accept the keyword 'hist'.
+    tasks : dict
+        Keyword arguments of func for every year.
+    msg : str
+        Progress message, formatted with the year.
+    processes, executor, callback
+        See _postprocess.
+    on_result : callable, optional
+        Called as ``on_result(year, result)`` in the calling process with
+        the return value of func, before callback.
+    """
+
+    # no multiprocessing
+    if executor is None and processes == 1:
+        for year, kwargs in tasks.items():
+            print(msg.format(year))
+
+            try:
+                result = func(**kwargs)
+            except Exception as error:
+                if callback is not None:
+                    callback(year, error)
+
+                raise RuntimeError(f"saving year {year} failed") from error
+
+            if on_result is not None:
+                on_result(year, result)
+
+            if callback is not None:
+                callback(year, None)
+        return
+
+    if executor is None:
+        with _ProcessPoolExecutor(max_workers=processes) as executor:
+            return _run_tasks(
+                func,
+                tasks,
                 msg,
+                executor=executor,
+                callback=callback,
+                on_result=on_result,
             )
 
-            # no multiprocessing
-            if processes == 1:
-                # save it
-                _save_var(args)
+    # only send the light-weight hist token to the workers
+    futures = dict()
+    for year, kwargs in tasks.items():
+        kwargs = dict(kwargs, hist=_hist_token(kwargs["hist"]))
+        futures[executor.submit(func, **kwargs)] = year
 
-            # multiprocessing
-            else:
-                all_args.append(args)
+    try:
+        for i, future in enumerate(_as_completed(futures), start=1):
+            year = futures[future]
+            error = future.exception()
 
-        # multiprocessing
-        if processes > 1:
-            pool = _multiprocessing.Pool(processes=processes)
+            if error is None and on_result is not None:
+                on_result(year, future.result())
 
-            p = pool.map_async(_save_var, all_args)
+            if callback is not None:
+                callback(year, error)
 
-            try:
-                p.get(0xFFFF)
-            except KeyboardInterrupt:
-                print("parent received control-c")
-                return
+            if error is not None:
+                raise RuntimeError(f"saving year {year} failed") from error
 
-    return dest_files
+            print(msg.format(year) + f" done ({i} of {len(futures)})")
+    finally:
+        # do not start the remaining years on errors (incl. control-c)
+        for future in futures:
+            future.cancel()
+
+
+def _hist_token(hist):
+    """
+    identify a hist object by the names of its case, component and stream
+    """
+
+    case = hist._case
+
+    return (case.case_name, case.ens, case.cesm_cases_path, hist.comp, hist.hist)
+
+
+@_lru_cache(maxsize=8)
+def _hist_from_token(token):
+    """
+    rebuild a hist object in a worker process (cached)
+    """
+
+    case_name, ens, cesm_cases_path, comp, hist = token
+
+    return _case(case_name, ens, cesm_cases_path)(comp, hist)
 
 
 def _destfile_name(hist, prefix, year):
@@ -426,6 +1036,70 @@ def _destfile_name(hist, prefix, year):
     return hist.post.pre_suf(prefix, str(year), prefix_folder=True)
 
 
+def _index_name(hist, prefix):
+    """
+    construct the full name of the index of the consolidated files
+    """
+
+    return hist.post.pre_suf(
+        prefix, "consolidated", prefix_folder=True, file_type="json"
+    )
+
+
+def _blocks(years, years_per_file):
+    """
+    group sorted years into blocks, e.g. 2000 to 2009 for years_per_file=10
+    """
+
+    if years_per_file is None:
+        return [list(years)]
+
+    blocks = dict()
+    for year in years:
+        blocks.setdefault(year // years_per_file, []).append(year)
+
+    return list(blocks.values())
+
+
+def _consolidated_files(hist, prefix, years):
+    """
+    the consolidated files containing years, see consolidate
+
+    Returns None if the years are not all contained in up-to-date
+    consolidated files.
+    """
+
+    index = _read_index(_index_name(hist, prefix))
+
+    if not index["files"]:
+        return None
+
+    folder = _os.path.dirname(_index_name(hist, prefix))
+
+    fNs, covered = [], set()
+    for entry in index["files"]:
+
+        fN = _os.path.join(folder, entry["filename"])
+        years_in_file = set(entry["years"]).intersection(years)
+
+        if not years_in_file or not _os.path.isfile(fN):
+            continue
+
+        yearly_files = {
+            int(year): _destfile_name(hist, prefix, int(year))
+            for year in entry["sources"]
+        }
+
+        if _is_fresh(entry, yearly_files):
+            fNs.append(fN)
+            covered |= years_in_file
+
+    if not covered.issuperset(years):
+        return None
+
+    return fNs
+
+
 def _prefix(prefix, varname):
     """
     parse prefix and add name of the variable
@@ -463,27 +1137,105 @@ def _prefix(prefix, varname):
     return [varname] + prefix
 
 
-def _save_var(args):
+def _save_vars(source_files, hist, outputs, encoding=None):
     """
-    save variable in annual files, one per variable
+    save variables in annual files, one per variable
+
+    Every source file is read only once for all outputs.
+
+    Parameters
+    ----------
+    source_files : list of str
+        The history files of one year.
+    hist : cesm hist class or tuple
+        Instance of the hist class from cesm package or a token, see
+        _hist_token.
+    outputs : list of dict
+        The variables to save, see _output. With the additional key
+        'dest_file'.
+    encoding : None | str | dict, optional
+        Encoding policy, see _postprocess.
     """
 
-    # unpack args
-    (source_files, dest_file, varname, hist, new_var, transform_func, msg) = args
+    datasets, provenances = _transform_year(source_files, hist, outputs)
 
-    print(msg)
+    for output, ds, provenance in zip(outputs, datasets, provenances):
 
-    # read file(s) and maybe concatenate
-    ds = xu.read_netcdfs_cesm(source_files, "time", transform_func(varname, hist))
+        # save as yearly file
+        ds.to_netcdf(
+            output["dest_file"],
+            format="NETCDF4_CLASSIC",
+            encoding=_encoding(ds, encoding),
+        )
 
-    # maybe rename
-    ds = ds.to_dataset(name=new_var)
+        # record what the file was created from (see _maybe_save)
+        _write_provenance(output["dest_file"], provenance)
 
-    # save as yearly file
-    ds.to_netcdf(dest_file, format="NETCDF4_CLASSIC")
 
+def _transform_year(source_files, hist, outputs):
+    """
+    read the source files of one year once and apply the transforms
+
+    Parameters
+    ----------
+    source_files, hist, outputs
+        See _save_vars.
 
-def _maybe_save(source_files=None, dest_file=None, force_save=False, check_age=False):
+    Returns
+    -------
+    datasets : list of xarray Dataset
+        The transformed data of every output.
+    provenances : list of dict
+        The provenance of every output, see provenance._provenance.
+    """
+
+    if isinstance(hist, tuple):
+        hist = _hist_from_token(hist)
+
+    # describe the source files before reading them
+    provenances = [
+        _provenance(
+            source_files,
+            output["varname"],
+            output["new_var"],
+            output["transform_func"],
+            output["variables"],
+        )
+        for output in outputs
+    ]
+
+    transforms = [
+        output["transform_func"](output["varname"], hist) for output in outputs
+    ]
+
+    # only read the variables required by any of the outputs
+    variables = list(dict.fromkeys(v for o in outputs for v in o["variables"]))
+
+    # read every file once and apply all transforms
+    transformed = [[] for _ in outputs]
+    for ds in xu.iter_netcdfs_cesm(source_files, variables=variables):
+        for transform, lst in zip(transforms, transformed):
+            lst.append(transform(ds))
+
+    # concatenate and maybe rename
+    datasets = [
+        xr.concat(lst, "time").to_dataset(name=output["new_var"])
+        for output, lst in zip(outputs, transformed)
+    ]
+
+    return datasets, provenances
+
+
+def _maybe_save(
+    source_files=None,
+    dest_file=None,
+    force_save=False,
+    check_age=False,
+    varname=None,
+    new_var=None,
+    transform_func=None,
+    variables=None,
+):
     """
     determine if a file needs to be computed and saved
 
@@ -497,8 +1249,10 @@ def _maybe_save(source_files=None, dest_file=None, force_save=False, check_age=F
     force_save : bool, optional
         If True, forces a (re-)save. Default: False.
     check_age : bool, optional
-        Check if source_files are younger than dest_file. If so,
-        re-save. Default: False.
+        Check if the inputs of dest_file changed (see _postprocess). If
+        so, re-save. Default: False.
+    varname, new_var, transform_func, variables : optional
+        As passed to _postprocess, required for check_age.
 
     """
 
@@ -509,9 +1263,25 @@ def _maybe_save(source_files=None, dest_file=None, force_save=False, check_age=F
     if _any_file_does_not_exist(dest_file):
         return True
 
-    # check if source file is newer as dest_file
+    # check if the source files or the transformation changed
     if check_age:
-        return _source_files_newer_(source_files, dest_file)
+
+        source_files = _str2lst(source_files)
+
+        # error later, see _check_all_files_exist
+        if _any_file_does_not_exist(source_files):
+            return True
+
+        provenance = _provenance(
+            source_files, varname, new_var, transform_func, variables
+        )
+        is_stale = _is_stale(dest_file, provenance)
+
+        # files saved without provenance
+        if is_stale is None:
+            return _source_files_newer_(source_files, dest_file)
+
+        return is_stale
 
     return False
 
@@ -540,20 +1310,21 @@ def _any_file_does_not_exist(fnames):
 
 def _source_files_newer_(source_files, dest_file):
     """
-    check if the any of the source files is older than the dest file
+    check if any of the source files is younger than the dest file
     """
 
     source_files = _str2lst(source_files)
 
-    # get timestamp of all files
-    age_source = [_os.path.getctime(sf) for sf in source_files]
-    age_dest = _os.path.getctime(dest_file)
+    # get the modification time of all files (ctime changes when the
+    # files are copied)
+    age_source = [_os.path.getmtime(sf) for sf in source_files]
+    age_dest = _os.path.getmtime(dest_file)
 
     # compare timestamps
-    source_is_older = np.array(age_source) < np.array(age_dest)
+    source_is_newer = np.array(age_source) > np.array(age_dest)
 
-    # return true if any is older
-    return np.all(source_is_older)
+    # return true if any is newer
+    return np.any(source_is_newer)
 
 
 def _str2lst(list_or_string):
@@ -0,0 +1,148 @@
+import json
+import os
+from functools import partial
+
+from .._case.post import _write_json
+
+# increase if the layout of the provenance file changes
+_PROVENANCE_VERSION = 1
+
+
+def _provenance(source_files, varname, new_var, transform_func, variables):
+    """describe the inputs of a postprocessed file
+
+    Parameters
+    ----------
+    source_files : list of str
+        History files from which the file is created.
+    varname : str
+        Name of the variable.
+    new_var : str
+        Name of the variable in the postprocessed file.
+    transform_func : function
+        Function used to read and process the data. A ``version`` attribute
+        of the function is recorded, increase it to recompute the files
+        after changing the function.
+    variables : list of str
+        Variables read from the source files.
+
+    Returns
+    -------
+    provenance : dict
+        JSON serializable description of the inputs.
+
+    ..Note::
+      The source files are identified by their name, size and modification
+      time (in seconds), which are preserved when the files are copied
+      with e.g. ``rsync -a``. Hashing their content would require reading
+      all history files every time.
+    """
+
+    sources = []
+    for fN in source_files:
+        stat = os.stat(fN)
+        sources.append(
+            dict(
+                filename=os.path.basename(fN),
+                size=stat.st_size,
+                mtime=int(stat.st_mtime),
+            )
+        )
+
+    provenance = dict(
+        version=_PROVENANCE_VERSION,
+        sources=sources,
+        transform=_transform_name(transform_func),
+        transform_version=_transform_version(transform_func),
+        varname=varname,
+        new_var=new_var,
+        variables=list(variables),
+    )
+
+    return provenance
+
+
+# -----------------------------------------------------------------------------
+
+
+def _transform_name(transform_func):
+    """module and name of a transformation function (including arguments)"""
+
+    if isinstance(transform_func, partial):
+        name = _transform_name(transform_func.func)
+        args = [repr(arg) for arg in transform_func.args]
+        args += [f"{k}={v!r}" for k, v in sorted(transform_func.keywords.items())]
+        return "{}({})".format(name, ", ".join(args))
+
+    module = getattr(transform_func, "__module__", None)
+    qualname = getattr(transform_func, "__qualname__", repr(transform_func))
+
+    return f"{module}.{qualname}"
+
+
+def _transform_version(transform_func):
+    """version attribute of a transformation function (0 if it has none)"""
+
+    if isinstance(transform_func, partial):
+        return _transform_version(transform_func.func)
+
+    return getattr(transform_func, "version", 0)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _provenance_file(dest_file):
+    """name of the provenance file of a postprocessed file"""
+
+    return os.path.splitext(dest_file)[0] + ".provenance.json"
+
+
+# -----------------------------------------------------------------------------
+
+
+def _read_provenance(dest_file):
+    """read the provenance of a postprocessed file
+
+    Returns
+    -------
+    provenance : dict or None
+        None if the file does not exist or can not be read.
+    """
+
+    fN = _provenance_file(dest_file)
+
+    if not os.path.isfile(fN):
+        return None
+
+    try:
+        with open(fN) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# -----------------------------------------------------------------------------
+
+
+def _write_provenance(dest_file, provenance):
+    """save the provenance of a postprocessed file next to it"""
+
+    _write_json(_provenance_file(dest_file), provenance)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _is_stale(dest_file, provenance):
+    """check if the inputs of dest_file differ from provenance
+
+    Returns None if dest_file has no provenance.
+    """
+
+    saved = _read_provenance(dest_file)
+
+    if saved is None:
+        return None
+
+    return saved != provenance
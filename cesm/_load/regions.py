@@ -0,0 +1,366 @@
+import hashlib
+import os
+
+import numpy as np
+import xarray as xr
+from scipy import sparse
+
+from .._case.post import _write_atomic
+
+try:
+    import regionmask
+except ImportError:
+    regionmask = None
+
+
+def _check_regionmask():
+    """error if regionmask is not installed"""
+
+    if regionmask is None:
+        msg = "Regional means require regionmask (pip install regionmask)."
+        raise ImportError(msg)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _grid_hash(*arrays):
+    """short hash of the coordinates and fields that define a grid"""
+
+    h = hashlib.sha1()
+
+    for arr in arrays:
+        if isinstance(arr, bytes):
+            h.update(arr)
+            continue
+
+        arr = np.ascontiguousarray(np.asarray(arr, dtype=float))
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+
+    return h.hexdigest()[:16]
+
+
+def _weights_file(hist, name, grid_hash):
+    """name of the file of the cached weights in the post folder"""
+
+    return hist.post.full(f"weights.{name}.{grid_hash}", file_type="npz")
+
+
+# -----------------------------------------------------------------------------
+
+
+def _weight_matrix(mask, weight, numbers):
+    """
+    sparse region x gridcell weight matrix
+
+    Parameters
+    ----------
+    mask : array
+        Number of the region of every gridcell (NaN outside of all regions).
+    weight : array
+        Weight of every gridcell, same shape as mask.
+    numbers : list of int
+        Numbers of the regions, one row per region.
+
+    Returns
+    -------
+    matrix : scipy.sparse.csr_matrix
+        Matrix of shape (regions, gridcells) with the weight of the gridcells
+        of each region, gridcells are flattened in C order.
+    """
+
+    mask = np.asarray(mask, dtype=float).ravel()
+    weight = np.asarray(weight, dtype=float).ravel()
+    numbers = np.asarray(numbers, dtype=float)
+
+    if mask.shape != weight.shape:
+        msg = "mask and weight must have the same shape"
+        raise ValueError(msg)
+
+    order = np.argsort(numbers)
+    sorted_numbers = numbers[order]
+
+    # row of the region of every gridcell
+    pos = np.searchsorted(sorted_numbers, mask).clip(max=numbers.size - 1)
+    sel = (sorted_numbers[pos] == mask) & np.isfinite(weight) & (weight != 0)
+
+    cols = np.flatnonzero(sel)
+    rows = order[pos[sel]]
+
+    shape = (numbers.size, mask.size)
+    return sparse.csr_matrix((weight[sel], (rows, cols)), shape=shape)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _cached_weights(fN, compute):
+    """
+    read a weight matrix or compute and save it if it does not exist
+
+    Parameters
+    ----------
+    fN : str
+        Name of the npz file.
+    compute : callable
+        Function without arguments returning the sparse matrix.
+    """
+
+    if os.path.isfile(fN):
+        try:
+            return sparse.load_npz(fN).tocsr()
+        except (OSError, ValueError):
+            # e.g. an incomplete file - compute again
+            pass
+
+    matrix = compute()
+
+    os.makedirs(os.path.dirname(fN), exist_ok=True)
+
+    # save_npz appends '.npz' to the temporary file name otherwise
+    _write_atomic(fN, lambda tmp: sparse.save_npz(tmp, matrix), suffix=".npz")
+
+    return matrix
+
+
+# -----------------------------------------------------------------------------
+
+
+def _regions_name(regions, name=None):
+    """name of the regions used in the file names"""
+
+    if name is None:
+        if isinstance(regions, str):
+            name = os.path.splitext(os.path.basename(regions))[0]
+        else:
+            name = regions.name
+
+    return str(name).lower().replace(" ", "_")
+
+
+def _read_mask(fN, lat, lon):
+    """
+    read an integer mask file and check it is on the grid
+
+    The file must contain one variable (or a variable called 'mask') with
+    the dimensions lat and lon, gridcells outside of all regions are NaN.
+
+    Returns
+    -------
+    mask : xarray DataArray
+        The mask with the dimensions (lat, lon).
+    numbers : list of int
+        The region numbers, from the 'flag_values' attribute or all numbers
+        in the mask.
+    abbrevs : list of str
+        The abbreviations of the regions, from the 'flag_meanings'
+        attribute or the numbers as str.
+    """
+
+    with xr.open_dataset(fN) as ds:
+        if "mask" in ds.data_vars:
+            mask = ds["mask"]
+        elif len(ds.data_vars) == 1:
+            (mask,) = ds.data_vars.values()
+        else:
+            msg = f"The mask file '{fN}' must contain one variable or 'mask'"
+            raise ValueError(msg)
+
+        mask = mask.load()
+
+    on_grid = (
+        set(mask.dims) == {"lat", "lon"}
+        and mask.lat.shape == lat.shape
+        and mask.lon.shape == lon.shape
+        and np.allclose(mask.lat, lat, atol=1e-4)
+        and np.allclose(mask.lon, lon, atol=1e-4)
+    )
+
+    if not on_grid:
+        msg = f"The mask ('{fN}') is not on the grid of the case."
+        raise ValueError(msg)
+
+    mask = mask.transpose("lat", "lon")
+
+    if "flag_values" in mask.attrs and "flag_meanings" in mask.attrs:
+        numbers = [int(n) for n in np.atleast_1d(mask.attrs["flag_values"])]
+        abbrevs = mask.attrs["flag_meanings"].split()
+    else:
+        values = mask.values[np.isfinite(mask.values)]
+        numbers = [int(n) for n in np.unique(values)]
+        abbrevs = [str(n) for n in numbers]
+
+    return mask, numbers, abbrevs
+
+
+# -----------------------------------------------------------------------------
+
+
+def _region_weights(hist, regions, weighting, name=None):
+    """
+    region x gridcell weight matrix of any regions (cached)
+
+    The mask and weights are computed once per grid, regions and weighting
+    and cached in the post folder of hist
+    ('weights.<name>.<weighting>.<hash>.npz').
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    regions : regionmask.Regions | str
+        Regions or the name of an integer mask file, see _read_mask.
+    weighting : str
+        Weight of the gridcells, see _data._cell_weights.
+    name : str, optional
+        Name of the regions, see _regions_name.
+
+    Returns
+    -------
+    matrix : scipy.sparse.csr_matrix
+        See _weight_matrix.
+    numbers : list of int
+        The number of every region (row).
+    abbrevs, names : list of str
+        The abbreviation and the name of every region.
+    """
+
+    weight = hist.data._cell_weights(weighting)
+    lat, lon = weight.lat, weight.lon
+
+    if isinstance(regions, str):
+        mask, numbers, abbrevs = _read_mask(regions, lat, lon)
+        names = abbrevs
+        key = [mask]
+
+        def _mask():
+            return mask
+
+    else:
+        numbers = list(regions.numbers)
+        abbrevs, names = list(regions.abbrevs), list(regions.names)
+        key = [np.asarray(numbers)] + [poly.wkb for poly in regions.polygons]
+
+        def _mask():
+            return regions.mask(lon, lat).transpose("lat", "lon")
+
+    grid_hash = _grid_hash(lat, lon, weight, *key)
+    name = f"{_regions_name(regions, name)}.{weighting}"
+    fN = _weights_file(hist, name, grid_hash)
+
+    def _compute():
+        return _weight_matrix(_mask(), weight, numbers)
+
+    matrix = _cached_weights(fN, _compute)
+
+    return matrix, numbers, abbrevs, names
+
+
+def _srex_weights(hist):
+    """SREX region x gridcell land weights (landfrac * cos(lat))"""
+
+    _check_regionmask()
+
+    srex = regionmask.defined_regions.srex
+    matrix, _, _, _ = _region_weights(hist, srex, "coslat_landfrac")
+
+    return matrix
+
+
+def _global_weights(data):
+    """
+    weights of the global, global land and global land w/o Antarctica means
+
+    Returns
+    -------
+    matrix : scipy.sparse.csr_matrix
+        Matrix of shape (3, gridcells), see _weight_matrix. Weighted with
+        cos(lat) (global) and cos(lat) * landfrac (land). Antarctica is
+        everything south of 60°S.
+    """
+
+    weight = data._cell_weights("coslat")
+    land = data._cell_weights("coslat_landfrac")
+
+    wo_antarctica = land.where((land.lat >= -60) & (land.lat <= 87), 0)
+
+    rows = [weight.values.ravel(), land.values.ravel(), wo_antarctica.values.ravel()]
+    rows = np.where(np.isfinite(rows), rows, 0)
+
+    return sparse.csr_matrix(rows)
+
+
+def _srex_land_weights(hist):
+    """
+    global, global land, global land w/o Antarctica and SREX land weights
+
+    Returns
+    -------
+    matrix : scipy.sparse.csr_matrix
+        Matrix of shape (3 + 26, gridcells), see _global_weights and
+        _srex_weights.
+    """
+
+    matrix = [_global_weights(hist.data), _srex_weights(hist)]
+
+    return sparse.vstack(matrix, format="csr")
+
+
+# -----------------------------------------------------------------------------
+
+
+def _regional_mean(da, matrix, dim="region"):
+    """
+    weighted mean over lat and lon for every row of a weight matrix
+
+    Computes all regions in one sparse matrix product. Missing values are
+    skipped (like xarray's weighted mean), regions without valid gridcells
+    are NaN.
+
+    Parameters
+    ----------
+    da : xarray DataArray
+        Field with the dimensions lat and lon (and e.g. time).
+    matrix : scipy.sparse matrix
+        Weight matrix of shape (regions, gridcells), see _weight_matrix.
+    dim : str, default: "region"
+        Name of the new dimension.
+
+    Returns
+    -------
+    mean : xarray DataArray
+        Regional means with the dimension dim last.
+    """
+
+    spatial = ("lat", "lon")
+    da = da.transpose(..., *spatial)
+
+    other = da.dims[:-2]
+    n_cells = da.shape[-2] * da.shape[-1]
+
+    if matrix.shape[1] != n_cells:
+        msg = "The weight matrix does not correspond to the grid of da."
+        raise ValueError(msg)
+
+    data = da.values.reshape(-1, n_cells)
+    valid = np.isfinite(data)
+
+    # (regions, cells) x (cells, n) -> (regions, n)
+    num = matrix @ np.where(valid, data, 0).T
+    den = matrix @ valid.T.astype(float)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(den != 0, num / den, np.nan)
+
+    mean = mean.T.reshape(da.shape[:-2] + (matrix.shape[0],))
+
+    coords = {
+        name: coord
+        for name, coord in da.coords.items()
+        if not set(coord.dims) & set(spatial)
+    }
+
+    return xr.DataArray(
+        mean, dims=other + (dim,), coords=coords, attrs=da.attrs, name=da.name
+    )
@@ -0,0 +1,159 @@
+import numpy as np
+import xarray as xr
+
+# weighting of the soil levels in a layer - see _soil_weights
+_WEIGHTINGS = ("DZSOI", "sum")
+
+
+def _soil_profile(field):
+    """
+    the profile of a soil field (e.g. DZSOI) along levgrnd
+
+    The soil levels are the same in every gridcell, the profile is taken
+    from the gridcells where all levels are valid.
+    """
+
+    other = [dim for dim in field.dims if dim != "levgrnd"]
+
+    values = field.transpose("levgrnd", *other).values
+    values = values.reshape(values.shape[0], -1)
+
+    valid = np.isfinite(values).all(axis=0)
+
+    if not valid.any():
+        msg = f"'{field.name}' has no gridcell where all levels are valid"
+        raise ValueError(msg)
+
+    values = values[:, valid]
+    profile = values[:, 0]
+
+    if not np.allclose(values, profile[:, np.newaxis]):
+        msg = f"Soil levels varying in space ('{field.name}') are not supported"
+        raise ValueError(msg)
+
+    return profile
+
+
+# -----------------------------------------------------------------------------
+
+
+def _soil_weights(data, bounds, weighting):
+    """
+    layer x levgrnd weight matrix
+
+    Parameters
+    ----------
+    data : cesm _data_lnd class
+        The grid data of the case (hist.data).
+    bounds : list of float
+        Depth (m) of the boundaries of the layers, e.g. [0, 0.1, 1, 2.9]
+        for three layers.
+    weighting : 'DZSOI' | 'sum'
+        'DZSOI': depth-weighted mean, every level is weighted with the
+        thickness of its overlap with the layer (from DZSOI).
+        'sum': sum over the levels whose node depth (ZSOI) lies in the
+        layer (lower bound excluded).
+
+    Returns
+    -------
+    weights : xarray DataArray
+        Weights with the dimensions (soillev, levgrnd), soillev is labeled
+        with the layer, e.g. '(0, 0.1]'.
+    """
+
+    if weighting not in _WEIGHTINGS:
+        weightings = "', '".join(_WEIGHTINGS)
+        msg = f"weighting ('{weighting}') must be any of: '{weightings}'"
+        raise ValueError(msg)
+
+    bounds = np.asarray(bounds, dtype=float)
+
+    if bounds.ndim != 1 or bounds.size < 2 or np.any(np.diff(bounds) <= 0):
+        msg = "bounds must be increasing with at least two elements"
+        raise ValueError(msg)
+
+    top, bottom = bounds[:-1, np.newaxis], bounds[1:, np.newaxis]
+
+    if weighting == "sum":
+        depth = _soil_profile(data.ZSOI)
+        weights = ((depth > top) & (depth <= bottom)).astype(float)
+    else:
+        thickness = _soil_profile(data.DZSOI)
+
+        # the interfaces of the levels
+        interfaces = np.concatenate([[0], np.cumsum(thickness)])
+
+        overlap = np.minimum(interfaces[1:], bottom) - np.maximum(interfaces[:-1], top)
+        overlap = overlap.clip(min=0)
+
+        with np.errstate(invalid="ignore"):
+            weights = overlap / overlap.sum(axis=1, keepdims=True)
+
+    labels = [f"({lo:g}, {hi:g}]" for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    return xr.DataArray(
+        weights,
+        dims=("soillev", "levgrnd"),
+        coords={
+            "soillev": labels,
+            "soillev_top": ("soillev", bounds[:-1]),
+            "soillev_bottom": ("soillev", bounds[1:]),
+        },
+    )
+
+
+# -----------------------------------------------------------------------------
+
+
+def _soil_layers(da, weights):
+    """
+    aggregate a field on levgrnd to the layers in one matrix product
+
+    A layer is NaN if any of its levels is NaN (levels that do not
+    contribute to a layer are ignored).
+
+    Parameters
+    ----------
+    da : xarray DataArray
+        Field with the dimension levgrnd.
+    weights : xarray DataArray
+        See _soil_weights.
+
+    Returns
+    -------
+    layers : xarray DataArray
+        The field with the dimension soillev instead of levgrnd.
+    """
+
+    n_lev = weights.sizes["levgrnd"]
+
+    if da.sizes["levgrnd"] < n_lev:
+        msg = "da has fewer levels than the weights"
+        raise ValueError(msg)
+
+    # levgrnd is the last axis
+    other = [dim for dim in da.dims if dim != "levgrnd"]
+    values = da.isel(levgrnd=slice(None, n_lev)).transpose(*other, "levgrnd").values
+
+    matrix = weights.values
+    isnan = np.isnan(values)
+
+    # (..., levgrnd) x (levgrnd, soillev) -> (..., soillev)
+    layers = np.where(isnan, 0, values) @ matrix.T
+    contaminated = isnan @ (matrix != 0).T
+
+    layers = np.where(contaminated, np.nan, layers)
+
+    coords = {
+        name: coord for name, coord in da.coords.items() if "levgrnd" not in coord.dims
+    }
+    coords.update(weights.soillev.coords)
+
+    result = xr.DataArray(
+        layers, dims=other + ["soillev"], coords=coords, attrs=da.attrs, name=da.name
+    )
+
+    # soillev at the position of levgrnd
+    dims = ["soillev" if dim == "levgrnd" else dim for dim in da.dims]
+
+    return result.transpose(*dims)
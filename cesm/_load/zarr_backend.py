@@ -0,0 +1,406 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+try:
+    import zarr
+except ImportError:
+    zarr = None
+
+from .load import (
+    _check_all_files_exist,
+    _provenance,
+    _run_tasks,
+    _transform_year,
+)
+
+# attributes of the store
+_REGIONS = "cesm_regions"
+_PROVENANCE = "cesm_provenance"
+_SLOT = "cesm_slot"
+_STEPS = "cesm_steps_per_file"
+
+
+def _check_zarr():
+    """error if zarr is not installed"""
+
+    if zarr is None:
+        msg = "The zarr backend requires zarr (pip install zarr)."
+        raise ImportError(msg)
+
+
+# -----------------------------------------------------------------------------
+
+
+def _store_name(hist, prefix):
+    """
+    construct the full name of the zarr store of a variable
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    prefix : list of str
+        Strings to prepend the name of the simulation (after the
+        folder). See also load._prefix.
+    """
+
+    return hist.post.pre_suf(prefix, prefix_folder=True, file_type="zarr")
+
+
+# -----------------------------------------------------------------------------
+
+
+def _postprocess_zarr(
+    hist,
+    output,
+    year,
+    force_save=False,
+    check_age=False,
+    processes=1,
+    executor=None,
+    callback=None,
+):
+    """
+    postprocess one variable into a zarr store
+
+    Every year is written to its own region along time. The store is
+    chunked in 'slots' with room for the time steps of a complete year and
+    every region consists of one or several slots, so years can be written
+    independently and concurrently. The store attributes contain the region
+    and the provenance of every year. A year that outgrows its region (e.g.
+    the last year of a running simulation) is moved to the end.
+
+    Parameters
+    ----------
+    hist : cesm hist class
+        Instance of the hist class from cesm package.
+    output : dict
+        Description of the variable, see load._output.
+    year, force_save, check_age, processes, executor, callback
+        See load._postprocess.
+
+    Returns
+    =======
+    store : str
+        Name of the zarr store.
+    years : array of int
+        The selected years.
+
+    ..Note::
+      The size of the regions is estimated from the number of source files
+      of every year, assuming every file has the same number of time steps.
+    """
+
+    _check_zarr()
+
+    store = _store_name(hist, output["prefix"])
+
+    # list of years we want to process
+    years = np.unique(hist.year[hist._get_sel(year=year)])
+
+    regions, provenance, slot, steps_per_file = _read_store_attrs(store)
+
+    years_require_saving = []
+    for year in years:
+
+        source_files = hist.sel(year=year)
+
+        if _maybe_save_year(
+            year, source_files, output, regions, provenance, force_save, check_age
+        ):
+            years_require_saving.append(year)
+
+            # check that all files exist or error
+            _check_all_files_exist(source_files)
+
+    if not years_require_saving:
+        return store, years
+
+    print(str(len(years_require_saving)) + " years require saving")
+
+    msg = "writing variable: {{}} in {}..{} to zarr".format(
+        np.min(years), np.max(years)
+    )
+
+    def _on_result(year, result):
+        *region, prov = result
+        regions[year] = tuple(region)
+        provenance[year] = prov
+        _write_store_attrs(store, regions, provenance, slot, steps_per_file)
+
+    # create the store from the first year
+    if slot is None:
+        first = years_require_saving.pop(0)
+        print(msg.format(first))
+
+        source_files = hist.sel(year=first)
+        (ds,), (prov,) = _transform_year(source_files, hist, [output])
+
+        # number of time steps of a complete year - the first year may be
+        # incomplete (e.g. a running simulation)
+        n_time = ds.sizes["time"]
+        steps_per_file = n_time / len(source_files)
+        n_files = max(len(hist.sel(year=y)) for y in np.unique(hist.year))
+        slot = int(np.ceil(steps_per_file * n_files))
+
+        regions, provenance = dict(), dict()
+
+        _create_store(store, ds, slot)
+        _on_result(first, (0, n_time, slot, prov))
+
+        if callback is not None:
+            callback(first, None)
+
+    # the region of every year
+    n_slots = _n_time(store) // slot
+
+    tasks = dict()
+    for year in years_require_saving:
+
+        source_files = hist.sel(year=year)
+
+        # estimated number of time steps
+        n_time = int(np.ceil(len(source_files) * steps_per_file))
+
+        if year in regions and regions[year][2] >= n_time:
+            start, _, capacity = regions[year]
+        else:
+            # new region at the end
+            start = n_slots * slot
+            capacity = max(1, int(np.ceil(n_time / slot))) * slot
+            n_slots += capacity // slot
+
+        tasks[year] = dict(
+            source_files=source_files,
+            hist=hist,
+            output=output,
+            store=store,
+            start=start,
+            capacity=capacity,
+        )
+
+    _resize_store(store, n_slots * slot)
+
+    try:
+        _run_tasks(
+            _save_year_zarr,
+            tasks,
+            msg,
+            processes,
+            executor,
+            callback,
+            on_result=_on_result,
+        )
+    finally:
+        zarr.consolidate_metadata(store)
+
+    return store, years
+
+
+# -----------------------------------------------------------------------------
+
+
+def _maybe_save_year(
+    year, source_files, output, regions, provenance, force_save, check_age
+):
+    """determine if a year needs to be computed and saved to the store"""
+
+    if force_save or year not in regions:
+        return True
+
+    if check_age:
+        # error later, see _check_all_files_exist
+        if not all(os.path.isfile(fN) for fN in source_files):
+            return True
+
+        current = _provenance(
+            source_files,
+            output["varname"],
+            output["new_var"],
+            output["transform_func"],
+            output["variables"],
+        )
+
+        return provenance.get(year) != current
+
+    return False
+
+
+# -----------------------------------------------------------------------------
+
+
+def _save_year_zarr(source_files, hist, output, store, start, capacity):
+    """
+    compute one year and write it to its region of the store
+
+    Returns
+    -------
+    start, stop : int
+        The time steps of the year.
+    capacity : int
+        Size of the region.
+    provenance : dict
+        See provenance._provenance.
+    """
+
+    (ds,), (provenance,) = _transform_year(source_files, hist, [output])
+
+    n_time = ds.sizes["time"]
+
+    if n_time > capacity:
+        msg = (
+            f"The year has {n_time} time steps, but its region only has room "
+            f"for {capacity}. Delete the store ('{store}') and save again."
+        )
+        raise ValueError(msg)
+
+    # only variables along time can be written to a region
+    ds = ds.drop_vars([name for name in ds.variables if "time" not in ds[name].dims])
+
+    # the metadata is consolidated by the calling process
+    ds.to_zarr(store, region={"time": slice(start, start + n_time)}, consolidated=False)
+
+    return start, start + n_time, capacity, provenance
+
+
+# -----------------------------------------------------------------------------
+
+
+def _create_store(store, ds, slot):
+    """create the store from one year, padded to the size of the slot"""
+
+    n_time = ds.sizes["time"]
+
+    # pad with copies of the first time step - they are never read but
+    # keep the time coordinate valid
+    if n_time < slot:
+        padding = ds.isel(time=np.zeros(slot - n_time, dtype=int))
+        ds = xr.concat([ds, padding], "time")
+
+    # one chunk per slot
+    encoding = {
+        name: {
+            "chunks": tuple(slot if dim == "time" else n for dim, n in da.sizes.items())
+        }
+        for name, da in ds.data_vars.items()
+    }
+
+    ds.to_zarr(store, mode="w", encoding=encoding)
+
+
+def _resize_store(store, n_time):
+    """enlarge all arrays along time to n_time"""
+
+    group = zarr.open_group(store, mode="r+")
+
+    for name, array in group.arrays():
+
+        dims = array.attrs.get("_ARRAY_DIMENSIONS", [])
+
+        if "time" not in dims:
+            continue
+
+        axis = dims.index("time")
+        n_old = array.shape[axis]
+
+        if n_old >= n_time:
+            continue
+
+        shape = list(array.shape)
+        shape[axis] = n_time
+        array.resize(*shape)
+
+        # keep the time coordinate valid (see _create_store)
+        if name == "time":
+            array[n_old:] = array[0]
+
+    zarr.consolidate_metadata(store)
+
+
+def _n_time(store):
+    """length of the time axis of the store"""
+
+    return zarr.open_group(store, mode="r")["time"].shape[0]
+
+
+# -----------------------------------------------------------------------------
+
+
+def _read_store_attrs(store):
+    """
+    regions, provenance, slot size and time steps per file of the store
+
+    The regions are (start, stop, capacity) for every year. Returns empty
+    dicts and None if the store does not exist or was not created
+    completely.
+    """
+
+    if not os.path.isdir(store):
+        return dict(), dict(), None, None
+
+    try:
+        attrs = zarr.open_group(store, mode="r").attrs.asdict()
+    except (KeyError, ValueError, zarr.errors.GroupNotFoundError):
+        return dict(), dict(), None, None
+
+    if _SLOT not in attrs:
+        return dict(), dict(), None, None
+
+    regions = {int(year): tuple(r) for year, r in attrs[_REGIONS].items()}
+    provenance = {int(year): p for year, p in attrs[_PROVENANCE].items()}
+
+    return regions, provenance, attrs[_SLOT], attrs[_STEPS]
+
+
+def _write_store_attrs(store, regions, provenance, slot, steps_per_file):
+    """save regions, provenance, slot size and time steps per file"""
+
+    group = zarr.open_group(store, mode="r+")
+
+    group.attrs.update(
+        {
+            _REGIONS: {str(year): list(r) for year, r in regions.items()},
+            _PROVENANCE: {str(year): p for year, p in provenance.items()},
+            _SLOT: slot,
+            _STEPS: steps_per_file,
+        }
+    )
+
+
+# -----------------------------------------------------------------------------
+
+
+def _open_zarr(store, years):
+    """
+    lazily open the selected years of a store
+
+    Parameters
+    ----------
+    store : str
+        Name of the zarr store.
+    years : list of int
+        Years to select, must all be in the store.
+
+    Returns
+    -------
+    ds : xarray Dataset
+        Dask-backed dataset of the years (sorted).
+    """
+
+    _check_zarr()
+
+    regions, _, _, _ = _read_store_attrs(store)
+
+    missing = [year for year in years if year not in regions]
+    if missing:
+        msg = f"years missing in the store: {missing}"
+        raise KeyError(msg)
+
+    index = [np.arange(*regions[year][:2]) for year in sorted(years)]
+    index = np.concatenate(index)
+
+    ds = xr.open_zarr(store)
+
+    return ds.isel(time=index)
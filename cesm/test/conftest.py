@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from synthetic import create_lnd_case
+
+import cesm
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "lnd_case(**kwargs): arguments of create_lnd_case for h0"
+    )
+
+    # do not write the inventories into the bundled test cases - set before
+    # the collection, as some test modules create cases on import
+    config._inventory_cache = tempfile.mkdtemp(prefix="cesm_inventories_")
+    config._inventory_cache_env = os.environ.get("CESM_INVENTORY_CACHE")
+    os.environ["CESM_INVENTORY_CACHE"] = config._inventory_cache
+
+
+def pytest_unconfigure(config):
+    if config._inventory_cache_env is None:
+        os.environ.pop("CESM_INVENTORY_CACHE", None)
+    else:
+        os.environ["CESM_INVENTORY_CACHE"] = config._inventory_cache_env
+
+    shutil.rmtree(config._inventory_cache, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def grid_cache(tmp_path_factory, monkeypatch):
+    # do not write the cached static fields to the home folder
+    folder = str(tmp_path_factory.mktemp("grids"))
+    monkeypatch.setenv("CESM_GRID_CACHE", folder)
+    return folder
+
+
+@pytest.fixture
+def h0(tmp_path, request):
+    # h0 of a synthetic lnd case in tmp_path, one year by default - pass the
+    # arguments of create_lnd_case with @pytest.mark.lnd_case(...) on the test
+    # or the module (pytestmark)
+    marker = request.node.get_closest_marker("lnd_case")
+    kwargs = marker.kwargs if marker is not None else dict()
+
+    yaml_str = create_lnd_case(str(tmp_path), **kwargs)
+    return cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+# days per month in the noleap calendar
+DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+name = "b.e122.B2000.f19_g16.synthetic-io192.001"
+
+
+def lnd_dataset(year, month, nlat=4, nlon=8, seed=0):
+    """a small monthly CLM history file (noleap calendar, days since 0001)"""
+
+    rng = np.random.default_rng(seed + year * 12 + month)
+
+    # CESM writes the time at the end of the averaging period
+    start = (year - 1) * 365 + DAYS[: month - 1].sum()
+    end = start + DAYS[month - 1]
+
+    time = xr.DataArray(
+        [end],
+        dims="time",
+        attrs={"units": "days since 0001-01-01 00:00:00", "calendar": "noleap"},
+    )
+
+    lat = np.linspace(-90, 90, nlat) + 1e-6
+    lon = np.arange(nlon) * 360 / nlon
+    levgrnd = np.array([0.0071, 0.0279, 0.0623, 0.1189, 0.2122, 0.3661, 0.6198])
+    dzsoi = np.array([0.0175, 0.0276, 0.0455, 0.0750, 0.1236, 0.2038, 0.3360])
+
+    shape = (1, nlat, nlon)
+
+    landfrac = np.ones((nlat, nlon))
+    landfrac[:, : nlon // 2] = 0.5
+
+    ds = xr.Dataset(
+        {
+            "time_bounds": (("time", "hist_interval"), [[start, end]]),
+            "TSA": (("time", "lat", "lon"), 280 + rng.normal(size=shape)),
+            "QSOIL": (("time", "lat", "lon"), rng.random(shape)),
+            "QVEGE": (("time", "lat", "lon"), rng.random(shape)),
+            "QVEGT": (("time", "lat", "lon"), rng.random(shape)),
+            "SOILLIQ": (
+                ("time", "levgrnd", "lat", "lon"),
+                rng.random((1, levgrnd.size, nlat, nlon)),
+            ),
+            "landfrac": (("lat", "lon"), landfrac),
+            "area": (("lat", "lon"), np.cos(np.deg2rad(lat))[:, None] * np.ones(nlon)),
+            "landmask": (("lat", "lon"), np.ones((nlat, nlon), dtype=int)),
+            "ZSOI": (
+                ("levgrnd", "lat", "lon"),
+                levgrnd[:, None, None] * np.ones((nlat, nlon)),
+            ),
+            "DZSOI": (
+                ("levgrnd", "lat", "lon"),
+                dzsoi[:, None, None] * np.ones((nlat, nlon)),
+            ),
+        },
+        coords={"time": time, "lat": lat, "lon": lon, "levgrnd": levgrnd},
+    )
+
+    return ds
+
+
+def create_lnd_case(folder, years=(2000,), months=range(1, 13), **kwargs):
+    """write monthly CLM history files and return the yaml string of the case"""
+
+    folder_hist = os.path.join(folder, name, "lnd", "hist")
+    os.makedirs(folder_hist, exist_ok=True)
+
+    for year in years:
+        for month in months:
+            fN = f"{name}.clm2.h0.{year:04d}-{month:02d}.nc"
+            ds = lnd_dataset(year, month, **kwargs)
+            ds.to_netcdf(os.path.join(folder_hist, fN), format="NETCDF4_CLASSIC")
+
+    return f"synthetic:\n    folder: {folder}\n    name: {name}\n"
+
+
+def atm_dataset(year, month, nlat=4, nlon=8, nlev=6, seed=0):
+    """a small monthly CAM history file with hybrid sigma-pressure levels"""
+
+    rng = np.random.default_rng(seed + year * 12 + month)
+
+    start = (year - 1) * 365 + DAYS[: month - 1].sum()
+    end = start + DAYS[month - 1]
+
+    time = xr.DataArray(
+        [end],
+        dims="time",
+        attrs={"units": "days since 0001-01-01 00:00:00", "calendar": "noleap"},
+    )
+
+    lat = np.linspace(-90, 90, nlat) + 1e-6
+    lon = np.arange(nlon) * 360 / nlon
+
+    # pure pressure levels at the top, terrain following at the bottom
+    eta = np.linspace(0.005, 1, nlev + 1)
+    hybi = np.clip((eta - 0.2) / 0.8, 0, 1)
+    hyai = eta - hybi
+    hyam = (hyai[1:] + hyai[:-1]) / 2
+    hybm = (hybi[1:] + hybi[:-1]) / 2
+
+    P0 = 100000.0
+    PS = 100000 + rng.normal(scale=1000, size=(1, nlat, nlon))
+
+    # temperature decreases with height
+    pressure = hyam[:, None, None] * P0 + hybm[:, None, None] * PS
+    T = 288 * (pressure / P0) ** 0.19 + rng.normal(scale=0.1, size=pressure.shape)
+
+    lev = (hyam + hybm) * 1000
+    ilev = (hyai + hybi) * 1000
+
+    ds = xr.Dataset(
+        {
+            "time_bnds": (("time", "nbnd"), [[start, end]]),
+            "hyam": ("lev", hyam),
+            "hybm": ("lev", hybm),
+            "hyai": ("ilev", hyai),
+            "hybi": ("ilev", hybi),
+            "P0": ((), P0),
+            "PS": (("time", "lat", "lon"), PS),
+            "T": (("time", "lev", "lat", "lon"), T[None]),
+            "LANDFRAC": (("time", "lat", "lon"), np.ones((1, nlat, nlon))),
+        },
+        coords={"time": time, "lat": lat, "lon": lon, "lev": lev, "ilev": ilev},
+    )
+
+    return ds
+
+
+def create_atm_case(folder, years=(2000,), months=range(1, 13), **kwargs):
+    """write monthly CAM history files and return the yaml string of the case"""
+
+    folder_hist = os.path.join(folder, name, "atm", "hist")
+    os.makedirs(folder_hist, exist_ok=True)
+
+    for year in years:
+        for month in months:
+            fN = f"{name}.cam.h0.{year:04d}-{month:02d}.nc"
+            ds = atm_dataset(year, month, **kwargs)
+            ds.to_netcdf(os.path.join(folder_hist, fN), format="NETCDF4_CLASSIC")
+
+    return f"synthetic:\n    folder: {folder}\n    name: {name}\n"
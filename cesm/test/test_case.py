@@ -1,7 +1,10 @@
+import os
+import shutil
 import tempfile
 import unittest
 
 import cesm_cases_yaml
+from synthetic import create_lnd_case
 
 import cesm
 
@@ -58,6 +61,83 @@ class TestCase_Cls(unittest.TestCase):
             IOError, cesm.case, case_name="test", cesm_cases_path=cesm_cases_path_temp
         )
 
+    def test_case_discover(self):
+
+        case = cesm.case("test_case", cesm_cases_path=cesm_cases_yaml.string)
+        case.discover(max_workers=2)
+
+        for comp in ["atm", "lnd", "ocn", "ice"]:
+            self.assertIsNotNone(getattr(case, "_" + comp))
+
+        self.assertEqual(len(case.lnd.h0.filename), 24)
+
+    def test_case_discover_invalid_comp(self):
+
+        case = cesm.case("test_case", cesm_cases_path=cesm_cases_yaml.string)
+
+        with self.assertRaises(KeyError):
+            case.discover(["lnd", "glc"])
+
+    def test_case_discover_no_comp_folder(self):
+
+        case_name = "test_case_no_comp_folder"
+        case = cesm.case(case_name, cesm_cases_path=cesm_cases_yaml.string)
+
+        # components without history folder are skipped by default
+        case.discover()
+
+        for comp in ["atm", "lnd", "ocn", "ice"]:
+            self.assertIsNone(getattr(case, "_" + comp))
+
+        # but not if they are requested explicitly
+        with self.assertRaises(OSError):
+            case.discover(["atm"])
+
+    def test_case_discover_keeps_parsed(self):
+
+        folder = tempfile.mkdtemp()
+        yaml_str = create_lnd_case(folder)
+        case = cesm.case("synthetic", cesm_cases_path=yaml_str)
+
+        # atm has no history folder
+        with self.assertRaises(OSError):
+            case.discover(["lnd", "atm"])
+
+        self.assertIsNotNone(case._lnd)
+        self.assertIsNone(case._atm)
+
+        shutil.rmtree(folder)
+
+    def test_case_cesm_cases_yaml_cached(self):
+
+        path = tempfile.mktemp(".yaml")
+
+        with open(path, "w") as f:
+            f.write(cesm_cases_yaml.string)
+
+        casedefs = cesm._case.case.__read_yaml__(path)
+        self.assertIs(casedefs, cesm._case.case.__read_yaml__(path))
+
+        # the cache is invalidated if the file changes
+        with open(path, "a") as f:
+            f.write("\nnew_case:\n    folder: /\n    name: new\n")
+
+        self.assertIn("new_case", cesm._case.case.__read_yaml__(path))
+
+        # explicit invalidation
+        cesm.clear_cesm_cases_cache(path)
+        self.assertIsNot(casedefs, cesm._case.case.__read_yaml__(path))
+
+        os.remove(path)
+
+    def test_case_casedef_not_modified(self):
+
+        case = cesm.case("test_case_post", cesm_cases_path=cesm_cases_yaml.string)
+        casedefs = cesm._case.case.__read_yaml__(cesm_cases_yaml.string)
+
+        self.assertIn("{name}", casedefs["test_case_post"]["folder_hist"])
+        self.assertNotIn("{name}", case.casedef["folder_hist"])
+
 
 if __name__ == "__main__":
     unittest.main(buffer=True)
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+from synthetic import create_lnd_case
+
+import cesm
+from cesm._load import climatology, load
+from cesm.utils import xarray_utils as xu
+
+
+def _expected(h0, year=None):
+    da = xu.read_netcdfs_cesm(h0.sel(year=year), "time").TSA
+    grouped = da.groupby("time.month")
+    return grouped.mean("time"), grouped.var("time")
+
+
+@pytest.mark.lnd_case(years=(2000, 2001, 2002))
+def test_clim_monthly(h0):
+
+    clim = load.clim_monthly(h0, "TSA", year=None, variance=True)
+
+    mean, var = _expected(h0)
+
+    xr.testing.assert_allclose(clim.TSA, mean)
+    xr.testing.assert_allclose(clim.TSA_var, var)
+
+
+@pytest.mark.lnd_case(years=(2000, 2001))
+def test_clim_monthly_extend(h0, tmp_path):
+
+    load.clim_monthly(h0, "TSA", year=None)
+
+    state = climatology._state_name(h0, "TSA")
+    _, provenance = climatology._read_state(state)
+    assert sorted(provenance) == [2000, 2001]
+
+    # the simulation continues
+    yaml_str = create_lnd_case(str(tmp_path), years=(2002,))
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+    # only the new year is read
+    read = []
+    clim = climatology._clim_monthly(
+        h0, "TSA", year=None, variance=True, callback=lambda y, e: read.append(y)
+    )
+    assert read == [2002]
+
+    _, provenance = climatology._read_state(state)
+    assert sorted(provenance) == [2000, 2001, 2002]
+
+    mean, var = _expected(h0)
+    xr.testing.assert_allclose(clim.TSA, mean)
+    xr.testing.assert_allclose(clim.TSA_var, var)
+
+
+@pytest.mark.lnd_case(years=(2000, 2001, 2002))
+def test_clim_monthly_subset_and_check_age(h0):
+
+    load.clim_monthly(h0, "TSA", year=None)
+
+    # fewer years than in the state: from scratch
+    clim = load.clim_monthly(h0, "TSA", year=slice(2000, 2001))
+    mean, _ = _expected(h0, year=slice(2000, 2001))
+    xr.testing.assert_allclose(clim.TSA, mean)
+
+    # a changed history file
+    source_file = h0.sel(year=2001)[0]
+    stat = os.stat(source_file)
+    os.utime(source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**10))
+
+    read = []
+    climatology._clim_monthly(
+        h0,
+        "TSA",
+        year=slice(2000, 2001),
+        check_age=True,
+        callback=lambda y, e: read.append(y),
+    )
+    assert sorted(read) == [2000, 2001]
+
+
+@pytest.mark.lnd_case(years=(2000, 2001))
+def test_clim_monthly_processes(h0):
+
+    clim = load.clim_monthly(h0, "TSA", year=None, processes=2)
+
+    mean, _ = _expected(h0)
+    xr.testing.assert_allclose(clim.TSA, mean)
+
+
+def test_merge_nan():
+
+    time = xr.cftime_range("2000-01-01", periods=4, freq="D", calendar="noleap")
+    a = xr.DataArray([[1.0, np.nan], [3.0, np.nan]], dims=("time", "cell"))
+    b = xr.DataArray([[5.0, np.nan], [np.nan, 2.0]], dims=("time", "cell"))
+
+    a = a.assign_coords(time=time[:2])
+    b = b.assign_coords(time=time[2:])
+
+    state = climatology._merge(climatology._accumulate(a), climatology._accumulate(b))
+    clim = climatology._climatology(state, "x", variance=True)
+
+    expected = xr.concat([a, b], "time")
+    np.testing.assert_allclose(clim.x.sel(month=1), expected.mean("time"))
+    np.testing.assert_allclose(clim.x_var.sel(month=1), expected.var("time"))
+
+    assert clim.x.sel(month=2).isnull().all()
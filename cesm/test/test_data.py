@@ -0,0 +1,293 @@
+import gc
+import os
+import shutil
+import weakref
+from functools import partial
+
+import numpy as np
+import pytest
+import xarray as xr
+from synthetic import create_atm_case, create_lnd_case
+
+import cesm
+from cesm._case import data as data_module
+from cesm._load import load
+from cesm.utils import xarray_utils as xu
+
+
+@pytest.mark.parametrize("kind", ["coslat", "coslat_landfrac", "area", "area_landfrac"])
+def test_global_mean(h0, kind):
+
+    tsa = xu.read_netcdfs_cesm(h0.sel(), "time").TSA
+    tsa[0, 0, 0] = np.nan
+
+    data = h0.data
+    weight = {"coslat": data.weight, "area": data.area}[kind.split("_")[0]]
+    if kind.endswith("landfrac"):
+        weight = weight * data.landfrac
+
+    result = data.global_mean(tsa, kind=kind)
+    expected = tsa.weighted(weight).mean(("lat", "lon"))
+
+    xr.testing.assert_allclose(result, expected)
+
+
+def test_global_mean_cached(h0):
+
+    data = h0.data
+    tsa = xu.read_netcdfs_cesm(h0.sel(), "time").TSA
+
+    data.global_mean(tsa, kind="area")
+    weights = data._grid.global_weights["area"]
+
+    data.global_mean(tsa.isel(time=0), kind="area")
+
+    assert data._grid.global_weights["area"] is weights
+    np.testing.assert_allclose(weights.sum(), 1)
+
+
+def test_global_mean_errors(h0):
+
+    tsa = xu.read_netcdfs_cesm(h0.sel(year=2000, month=1), "time").TSA
+
+    with pytest.raises(ValueError, match="must be any of"):
+        h0.data.global_mean(tsa, kind="land")
+
+    with pytest.raises(ValueError, match="grid"):
+        h0.data.global_mean(tsa.isel(lat=slice(1, None)))
+
+
+def test_static_cache(h0, grid_cache, tmp_path, monkeypatch):
+
+    landfrac = h0.data.landfrac
+
+    (fN,) = os.listdir(grid_cache)
+    assert fN.startswith("lnd.f19_g16.")
+    assert os.path.isfile(h0.post.pre_suf(suffix="grid", file_type="json"))
+
+    # another instance does not read the history files
+    def _fail(*args, **kwargs):
+        raise AssertionError("history file opened")
+
+    monkeypatch.setattr(data_module.xu, "open_cesm", _fail)
+    monkeypatch.setattr("cesm._case.static.xu.open_cesm", _fail)
+
+    yaml_str = create_lnd_case(str(tmp_path), years=())
+    h0_new = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+    data = data_module._data_lnd(h0_new)
+
+    xr.testing.assert_identical(data.landfrac, landfrac)
+    xr.testing.assert_identical(data.area, h0.data.area)
+    xr.testing.assert_identical(data.lat, h0.data.lat)
+
+
+def test_static_shared_and_missing(h0, grid_cache, tmp_path):
+
+    yaml_str = create_lnd_case(str(tmp_path / "other"), years=(2000,))
+    other = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+    xr.testing.assert_identical(other.data.area, h0.data.area)
+
+    # both cases share one file
+    assert len(os.listdir(grid_cache)) == 1
+
+    # not in the history files
+    with pytest.raises(KeyError):
+        h0.data.__get_data__("DZSOI_missing")
+
+
+def test_static_shared_and_missing_atm(grid_cache, tmp_path):
+
+    from cesm._case.static import _get_static
+
+    yaml_a = create_atm_case(str(tmp_path / "a"), years=(2000,), months=[1])
+    yaml_b = create_atm_case(str(tmp_path / "b"), years=(2010,), months=[1])
+
+    a = cesm.case("synthetic", cesm_cases_path=yaml_a).atm.h0
+    b = cesm.case("synthetic", cesm_cases_path=yaml_b).atm.h0
+
+    assert a.data.landfrac.dims == ("lat", "lon")
+    xr.testing.assert_identical(a.data.landfrac, b.data.landfrac)
+
+    # cases starting in another year share one file
+    assert len(os.listdir(grid_cache)) == 1
+
+    # the hash does not change when the history file is read again
+    _, key = _get_static(a, data_module._data_atm._static_fields, "atm")
+    os.remove(a.post.pre_suf(suffix="grid", file_type="json"))
+    assert _get_static(a, data_module._data_atm._static_fields, "atm")[1] == key
+
+    # not a static field - loaded from the history file
+    PS = a.data.__get_data__("PS")
+    assert PS._in_memory
+
+    with pytest.raises(KeyError):
+        a.data.__get_data__("PS_missing")
+
+
+def test_grid_registry(tmp_path):
+
+    yaml_a = create_lnd_case(str(tmp_path / "a"), years=(2000,), nlat=5)
+    yaml_b = create_lnd_case(str(tmp_path / "b"), years=(2000,), nlat=5)
+    yaml_c = create_lnd_case(str(tmp_path / "c"), years=(2000,), nlat=6)
+
+    a = cesm.case("synthetic", cesm_cases_path=yaml_a)
+    b = cesm.case("synthetic", cesm_cases_path=yaml_b)
+    c = cesm.case("synthetic", cesm_cases_path=yaml_c)
+
+    # the same grid
+    assert a.lnd.h0.data._grid is b.lnd.h0.data._grid
+    assert a.lnd.h0.data._grid is not c.lnd.h0.data._grid
+
+    def keys():
+        return {g["grid_hash"]: g for g in cesm.registered_grids()}
+
+    hashes = {
+        os.path.basename(fN).split(".")[2]
+        for fN in os.listdir(os.environ["CESM_GRID_CACHE"])
+    }
+    assert len(hashes) == 2
+
+    grids = keys()
+    assert hashes <= set(grids)
+    assert all(grids[h]["nbytes"] > 0 for h in hashes)
+    assert all(grids[h]["resolution"] == "f19_g16" for h in hashes)
+
+    del a, b, c
+    gc.collect()
+
+    assert not hashes & set(keys())
+
+
+def test_grid_registry_atm(tmp_path):
+
+    # remove the grids of other tests
+    gc.collect()
+
+    yaml_a = create_atm_case(str(tmp_path / "a"), years=(2000,), months=[1])
+    yaml_b = create_atm_case(str(tmp_path / "b"), years=(2010,), months=[1])
+    yaml_c = create_atm_case(str(tmp_path / "c"), years=(2000,), months=[1], nlat=5)
+
+    a = cesm.case("synthetic", cesm_cases_path=yaml_a)
+    b = cesm.case("synthetic", cesm_cases_path=yaml_b)
+    c = cesm.case("synthetic", cesm_cases_path=yaml_c)
+
+    # the same grid, also if the cases start in another year
+    assert a.atm.h0.data._grid is b.atm.h0.data._grid
+    assert a.atm.h0.data._grid is not c.atm.h0.data._grid
+
+    grids = [g for g in cesm.registered_grids() if g["comp"] == "atm"]
+    assert len(grids) == 2
+
+
+def test_grid_registry_no_case_state(tmp_path):
+
+    yaml_a = create_lnd_case(str(tmp_path / "a"), years=(2000,))
+    yaml_b = create_lnd_case(str(tmp_path / "b"), years=(2000,))
+
+    a = cesm.case("synthetic", cesm_cases_path=yaml_a)
+    b = cesm.case("synthetic", cesm_cases_path=yaml_b)
+
+    assert a.lnd.h0.data._grid is b.lnd.h0.data._grid
+
+    # fields that are not static are read from the history files of the case
+    shutil.rmtree(tmp_path / "a")
+    b.lnd.h0.data.__get_data__("TSA")
+
+    # the grid does not keep the other case alive
+    ref = weakref.ref(a)
+    del a
+    gc.collect()
+
+    assert ref() is None
+    assert b.lnd.h0.data.landfrac is not None
+
+
+@pytest.fixture
+def atm_h0(tmp_path):
+    yaml_str = create_atm_case(str(tmp_path), years=(2000,), months=[1, 2])
+    return cesm.case("synthetic", cesm_cases_path=yaml_str).atm.h0
+
+
+def test_pressure(atm_h0):
+
+    ds = xu.read_netcdfs_cesm(atm_h0.sel(), "time")
+    data = atm_h0.data
+
+    pressure = data.pressure(ds.PS)
+    assert pressure.dims == ("time", "lev", "lat", "lon")
+
+    expected = ds.hyam * ds.P0 + ds.hybm * ds.PS
+    np.testing.assert_allclose(pressure, expected.transpose(*pressure.dims))
+
+    pressure = data.pressure(ds.PS, interfaces=True)
+    assert pressure.dims == ("time", "ilev", "lat", "lon")
+
+    # pressure at the lowest interface is the surface pressure
+    np.testing.assert_allclose(pressure.isel(ilev=-1), ds.PS)
+
+
+def test_interp_to_pressure(atm_h0):
+
+    ds = xu.read_netcdfs_cesm(atm_h0.sel(), "time")
+    data = atm_h0.data
+
+    plevs = [10000.0, 50000.0, 85000.0, 110000.0]
+
+    result = data.interp_to_pressure(ds.T, ds.PS, plevs)
+
+    assert result.dims == ("time", "plev", "lat", "lon")
+    np.testing.assert_equal(result.plev.values, plevs)
+
+    # loop over the columns
+    pressure = data.pressure(ds.PS).values
+    T = ds.T.values
+    expected = np.empty(result.shape)
+
+    for t, i, j in np.ndindex(T.shape[0], T.shape[2], T.shape[3]):
+        logp = np.log(pressure[t, :, i, j])
+        expected[t, :, i, j] = np.interp(
+            np.log(plevs), logp, T[t, :, i, j], left=np.nan, right=np.nan
+        )
+
+    np.testing.assert_allclose(result, expected)
+
+    # below the surface
+    assert result.sel(plev=110000.0).isnull().all()
+
+    # dask
+    result_dask = data.interp_to_pressure(
+        ds.T.chunk(time=1), ds.PS.chunk(time=1), plevs
+    )
+    assert result_dask.chunks is not None
+    xr.testing.assert_allclose(result_dask.compute(), result)
+
+
+def _trans_plev(varname, hist, plevs):
+    def _inner(ds):
+        return hist.data.interp_to_pressure(ds[varname], ds.PS, plevs)
+
+    return _inner
+
+
+def test_interp_to_pressure_transform(atm_h0):
+
+    plevs = (50000.0, 85000.0)
+    transform_func = partial(_trans_plev, plevs=plevs)
+
+    fNs = load._postprocess(
+        atm_h0,
+        "T",
+        year=2000,
+        prefix="plev",
+        transform_func=transform_func,
+        variables=["T", "PS"],
+        processes=2,
+    )
+
+    result = xu.read_netcdfs_cesm(fNs, "time")
+
+    ds = xu.read_netcdfs_cesm(atm_h0.sel(), "time")
+    expected = atm_h0.data.interp_to_pressure(ds.T, ds.PS, plevs)
+
+    xr.testing.assert_allclose(result.T, expected)
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cesm_cases_yaml
+import numpy as np
+from synthetic import create_lnd_case, name
+
+import cesm
+
+ens = cesm.ensemble(
+    "test_case_ens", components=["lnd", "atm"], cesm_cases_path=cesm_cases_yaml.string
+)
+
+
+class TestCase_Cls(unittest.TestCase):
+    def test_ensemble_members(self):
+
+        self.assertEqual(len(ens), 2)
+        self.assertEqual(ens[1].ens, 1)
+
+        for member in ens:
+            self.assertIsNotNone(member._lnd)
+            self.assertIsNotNone(member._atm)
+            self.assertIsNone(member._ocn)
+
+    def test_ensemble_not_an_ensemble(self):
+
+        with self.assertRaises(ValueError):
+            cesm.ensemble("test_case", cesm_cases_path=cesm_cases_yaml.string)
+
+    def test_ensemble_sel(self):
+
+        table = ens.sel("lnd", "h0", year=2001, month=slice(1, 3))
+
+        self.assertEqual(table.shape, (2, 3))
+        np.testing.assert_equal(table[0], table[1])
+
+        expected = ens[0].lnd.h0.sel(year=2001, month=slice(1, 3))
+        np.testing.assert_equal(table[0], expected)
+
+    def test_ensemble_sel_last(self):
+
+        table = ens.sel("lnd", "h0", year=2001, last=False)
+
+        self.assertEqual(table.shape, (2, 11))
+        self.assertTrue(os.path.basename(table[0, -1]).endswith("2001-11.nc"))
+
+
+    def test_ensemble_missing_comp_and_refresh(self):
+
+        folder = tempfile.mkdtemp()
+        create_lnd_case(folder, years=(2000,))
+
+        yaml_str = (
+            f"synthetic_ens:\n"
+            f"    -   folder: {folder}\n        name: {name}\n"
+            f"    -   folder: {folder}\n        name: {name}\n"
+        )
+
+        # land only - the other components are skipped
+        ens = cesm.ensemble("synthetic_ens", cesm_cases_path=yaml_str)
+
+        self.assertIsNotNone(ens[0]._lnd)
+        self.assertIsNone(ens[0]._atm)
+
+        self.assertEqual(ens.sel("lnd", "h0").shape, (2, 12))
+
+        # but not if requested explicitly
+        with self.assertRaises(OSError):
+            cesm.ensemble("synthetic_ens", ["atm"], cesm_cases_path=yaml_str)
+
+        # new files are selected after refresh
+        create_lnd_case(folder, years=(2001,), months=[1])
+        for member in ens:
+            member.refresh()
+
+        self.assertEqual(ens.sel("lnd", "h0").shape, (2, 13))
+
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+import xarray as xr
+from synthetic import create_lnd_case
+
+import cesm
+from cesm.utils import xarray_utils as xu
+
+
+@pytest.fixture(scope="module")
+def h0(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("hist_open"))
+    yaml_str = create_lnd_case(folder, years=(2000, 2001))
+    return cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+
+def test_hist_open_is_lazy(h0):
+
+    ds = h0.open()
+
+    assert ds.TSA.chunks is not None
+    assert ds.TSA.sizes["time"] == 24
+
+
+def test_hist_open_same_as_read_netcdfs(h0):
+
+    files = h0.sel(year=2001)
+    expected = xu.read_netcdfs_cesm(files, "time")
+
+    result = h0.open(varnames=["TSA", "QSOIL"], year=2001, chunks={"time": 6})
+
+    assert set(result.data_vars) == {"TSA", "QSOIL", "time_bounds"}
+    assert result.TSA.chunks[0] == (6, 6)
+
+    xr.testing.assert_allclose(result.TSA.load(), expected.TSA)
+    np.testing.assert_equal(result.lat.values, expected.lat.values)
+
+    # time is at the middle of the month
+    assert result.time.dt.day[0] == 16
@@ -0,0 +1,166 @@
+import os
+
+import numpy as np
+
+import cesm
+from cesm._case.inventory import (
+    _parse_hist_files,
+    _parse_hist_files_re,
+    _read_inventory,
+)
+
+name = "b.e122.B2000.f19_g16.inventory-io192.001"
+
+
+def create_case(folder, months=range(1, 13), year=2000):
+    """create empty lnd history files and the corresponding yaml string"""
+
+    folder_hist = os.path.join(folder, name, "lnd", "hist")
+    os.makedirs(folder_hist, exist_ok=True)
+
+    for month in months:
+        fN = f"{name}.clm2.h0.{year:04d}-{month:02d}.nc"
+        open(os.path.join(folder_hist, fN), "w").close()
+
+    # pretend the folder was last modified a while ago
+    os.utime(folder_hist, (0, 0))
+
+    return f"test_inventory:\n    folder: {folder}\n    name: {name}\n"
+
+
+def test_inventory_is_written(tmp_path):
+
+    yaml_str = create_case(str(tmp_path))
+    lnd = cesm.case("test_inventory", cesm_cases_path=yaml_str).lnd
+
+    fN = lnd.__inventory_file__()
+    assert os.path.isfile(fN)
+
+    inventory = _read_inventory(fN, lnd.folder_hist, name + ".clm2")
+
+    np.testing.assert_equal(inventory["month"], np.arange(1, 13))
+    np.testing.assert_equal(inventory["filename"], lnd.h0.filename)
+
+
+def test_inventory_is_used(tmp_path, monkeypatch):
+
+    yaml_str = create_case(str(tmp_path))
+    expected = cesm.case("test_inventory", cesm_cases_path=yaml_str).lnd.h0
+
+    def raise_if_called(self):
+        raise AssertionError("folder should not be listed")
+
+    monkeypatch.setattr(cesm._lnd, "__get_hist_files__", raise_if_called)
+
+    h0 = cesm.case("test_inventory", cesm_cases_path=yaml_str).lnd.h0
+
+    assert h0.fullname == expected.fullname
+    np.testing.assert_equal(h0.year, expected.year)
+
+
+def test_inventory_invalid_after_modification(tmp_path):
+
+    yaml_str = create_case(str(tmp_path))
+    cesm.case("test_inventory", cesm_cases_path=yaml_str).lnd
+
+    create_case(str(tmp_path), months=[1], year=2001)
+    os.utime(os.path.join(tmp_path, name, "lnd", "hist"), (1, 1))
+
+    lnd = cesm.case("test_inventory", cesm_cases_path=yaml_str).lnd
+
+    assert len(lnd.h0.filename) == 13
+    assert lnd.h0.year[-1] == 2001
+
+
+def test_refresh(tmp_path):
+
+    yaml_str = create_case(str(tmp_path))
+    case = cesm.case("test_inventory", cesm_cases_path=yaml_str)
+    h0 = case.lnd.h0
+
+    assert case.refresh() == {}
+
+    create_case(str(tmp_path), months=[1, 2], year=2001)
+    os.utime(os.path.join(tmp_path, name, "lnd", "hist"), (1, 1))
+
+    assert case.refresh() == {"lnd": {"h0": 2}}
+
+    # the existing object is updated
+    assert case.lnd.h0 is h0
+    np.testing.assert_equal(h0.year, [2000] * 12 + [2001] * 2)
+    np.testing.assert_equal(h0.month, list(range(1, 13)) + [1, 2])
+    assert h0.sel(year=2001, month=2).endswith("h0.2001-02.nc")
+
+
+def test_refresh_new_stream_and_removed(tmp_path):
+
+    yaml_str = create_case(str(tmp_path))
+    lnd = cesm.case("test_inventory", cesm_cases_path=yaml_str).lnd
+
+    folder_hist = os.path.join(tmp_path, name, "lnd", "hist")
+    open(os.path.join(folder_hist, f"{name}.clm2.h1.2000-01-01-00000.nc"), "w").close()
+    os.remove(os.path.join(folder_hist, f"{name}.clm2.h0.2000-12.nc"))
+    os.utime(folder_hist, (1, 1))
+
+    assert lnd.refresh() == {"h1": 1}
+    assert len(lnd.h0.filename) == 11
+    assert lnd._hist_unique == ["h0", "h1"]
+
+
+def test_parse_hist_files_vectorized():
+
+    hfiles = sorted(
+        [
+            f"{name}.clm2.h0.2000-01.nc",
+            f"{name}.clm2.h0.0001-12.nc",
+            f"{name}.clm2.h1.2000-01-01-00000.nc",
+            f"{name}.clm2.h2.2000-01-01.nc",
+            f"{name}.clm2.h.nday1.2000-01-01.nc",
+            f"{name}.clm2.h0.2000-02.nc.gz",
+            f"{name}.clm2.r.2000-01-01-00000.nc",
+            f"{name}.clm2.rh0.2000-01-01-00000.nc",
+            f"{name}.cam.h0.2000-01.nc",
+            f"{name}.clm2.h0.2000-1.nc",
+            "rpointer.lnd",
+        ]
+    )
+
+    re_str = cesm._lnd.__get_re_string__(
+        type("comp", (), {"casedef": {"name": name}, "_modname": "clm2"})
+    )
+
+    expected, expected_zipped = _parse_hist_files_re(hfiles, re_str)
+    result, is_zipped = _parse_hist_files(hfiles, re_str, name + ".clm2.")
+
+    assert is_zipped == expected_zipped == ".gz"
+
+    assert result.keys() == expected.keys()
+    for key in expected:
+        np.testing.assert_equal(result[key], expected[key])
+
+
+def test_parse_hist_files_vectorized_empty():
+
+    result, is_zipped = _parse_hist_files([], None, name + ".clm2.")
+
+    assert is_zipped == ""
+    assert result["filename"].size == 0
+
+    re_str = cesm._lnd.__get_re_string__(
+        type("comp", (), {"casedef": {"name": name}, "_modname": "clm2"})
+    )
+
+    # e.g. a freshly started run - all names are shorter than the prefix
+    result, is_zipped = _parse_hist_files(["rpointer.lnd"], re_str, name + ".clm2.")
+
+    assert is_zipped == ""
+    assert result["filename"].size == 0
+
+    # only zipped files
+    hfiles = ["rpointer.lnd", f"{name}.clm2.h0.2000-01.nc.gz"]
+    expected, _ = _parse_hist_files_re(hfiles, re_str)
+    result, is_zipped = _parse_hist_files(hfiles, re_str, name + ".clm2.")
+
+    assert is_zipped == ".gz"
+    for key in expected:
+        np.testing.assert_equal(result[key], expected[key])
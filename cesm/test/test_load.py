@@ -0,0 +1,342 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from cesm._load import load
+from cesm._load.provenance import _provenance_file, _read_provenance
+from cesm.utils import xarray_utils as xu
+
+pytestmark = pytest.mark.lnd_case(years=(2000, 2001))
+
+
+def _mtimes(fNs):
+    return [os.stat(fN).st_mtime_ns for fN in fNs]
+
+
+def test_var(h0):
+
+    ds = load.var(h0, "TSA", year=None)
+
+    expected = xr.concat([xr.open_dataset(fN) for fN in h0.sel()], "time")
+
+    assert ds.TSA.sizes["time"] == 24
+    xr.testing.assert_allclose(ds.TSA, expected.TSA.assign_coords(time=ds.time))
+
+
+def test_var_selects_once(h0, monkeypatch):
+
+    calls = []
+    _get_sel = h0._get_sel
+
+    def _counting_get_sel(*args, **kwargs):
+        calls.append(kwargs)
+        return _get_sel(*args, **kwargs)
+
+    monkeypatch.setattr(h0, "_get_sel", _counting_get_sel)
+
+    # warnings about missing years are only shown once (hist.sel passes
+    # positional arguments when selecting the files of each year)
+    load.var(h0, "TSA", year=2000)
+    assert calls.count(dict(year=2000)) == 1
+
+
+def test_evapotranspiration(h0):
+
+    ds = load.evapotranspiration(h0, year=2000)
+
+    hist = xu.read_netcdfs_cesm(h0.sel(year=2000), "time")
+
+    xr.testing.assert_allclose(ds.ET, hist.QSOIL + hist.QVEGE + hist.QVEGT)
+
+
+def test_postprocess_provenance(h0):
+
+    dest_files = load._postprocess(h0, "TSA", year=None)
+
+    for dest_file in dest_files:
+        provenance = _read_provenance(dest_file)
+
+        assert provenance["varname"] == "TSA"
+        assert provenance["variables"] == ["TSA"]
+        assert len(provenance["sources"]) == 12
+
+
+def test_postprocess_check_age(h0):
+
+    dest_files = load._postprocess(h0, "TSA", year=None)
+    mtimes = _mtimes(dest_files)
+
+    # nothing changed
+    load._postprocess(h0, "TSA", year=None, check_age=True)
+    assert _mtimes(dest_files) == mtimes
+
+    # a source file of 2001 changed
+    source_file = h0.sel(year=2001)[3]
+    stat = os.stat(source_file)
+    os.utime(source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**10))
+
+    load._postprocess(h0, "TSA", year=None, check_age=True)
+    result = _mtimes(dest_files)
+
+    assert result[0] == mtimes[0]
+    assert result[1] != mtimes[1]
+
+    # the age of the dest files does not matter if they have a provenance
+    for dest_file in dest_files:
+        os.utime(dest_file, ns=(0, 0))
+
+    load._postprocess(h0, "TSA", year=None, check_age=True)
+    assert _mtimes(dest_files) == [0, 0]
+
+
+def test_postprocess_check_age_transform_version(h0):
+
+    def transform(varname, hist):
+        def _inner(ds):
+            return ds[varname] * 2
+
+        return _inner
+
+    dest_files = load._postprocess(h0, "TSA", year=2000, transform_func=transform)
+    mtimes = _mtimes(dest_files)
+
+    load._postprocess(h0, "TSA", year=2000, transform_func=transform, check_age=True)
+    assert _mtimes(dest_files) == mtimes
+
+    transform.version = 1
+    load._postprocess(h0, "TSA", year=2000, transform_func=transform, check_age=True)
+    assert _mtimes(dest_files) != mtimes
+
+
+def test_postprocess_check_age_no_provenance(h0):
+
+    dest_files = load._postprocess(h0, "TSA", year=2000)
+    os.remove(_provenance_file(dest_files[0]))
+
+    # the dest file is younger than the source files
+    mtimes = _mtimes(dest_files)
+    load._postprocess(h0, "TSA", year=2000, check_age=True)
+    assert _mtimes(dest_files) == mtimes
+
+    # the dest file is older than the source files
+    os.utime(dest_files[0], ns=(0, 0))
+    load._postprocess(h0, "TSA", year=2000, check_age=True)
+    assert _mtimes(dest_files) != [0]
+
+
+def _trans_fail(varname, hist):
+    def _inner(ds):
+        raise ValueError("transform failed")
+
+    return _inner
+
+
+@pytest.mark.parametrize("pool", ["processes", "executor"])
+def test_postprocess_processes(h0, pool):
+
+    expected = load.var(h0, "TSA", year=None)
+
+    done = []
+
+    def callback(year, error):
+        done.append((year, error))
+
+    if pool == "processes":
+        dest_files = load._postprocess(
+            h0, "TSA", None, force_save=True, processes=2, callback=callback
+        )
+    else:
+        with ProcessPoolExecutor(2) as executor:
+            dest_files = load._postprocess(
+                h0, "TSA", None, force_save=True, executor=executor, callback=callback
+            )
+
+    assert sorted(done) == [(2000, None), (2001, None)]
+
+    result = xr.concat([xr.open_dataset(fN) for fN in dest_files], "time")
+    xr.testing.assert_allclose(result.TSA, expected.TSA)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_postprocess_processes_error(h0, processes):
+
+    done = []
+
+    def callback(year, error):
+        done.append(error)
+
+    with pytest.raises(RuntimeError, match="saving year"):
+        load._postprocess(
+            h0,
+            "TSA",
+            None,
+            transform_func=_trans_fail,
+            processes=processes,
+            callback=callback,
+        )
+
+    assert isinstance(done[0], ValueError)
+
+
+def test_hist_token(h0):
+
+    token = load._hist_token(h0)
+
+    assert token[-2:] == ("lnd", "h0")
+    np.testing.assert_equal(load._hist_from_token(token).sel(), h0.sel())
+
+
+def test_vars(h0, monkeypatch):
+
+    opened = []
+    iter_netcdfs_cesm = xu.iter_netcdfs_cesm
+
+    def _iter(files, *args, **kwargs):
+        # only count the history files
+        opened.extend(fN for fN in files if fN in h0.sel())
+        return iter_netcdfs_cesm(files, *args, **kwargs)
+
+    monkeypatch.setattr(xu, "iter_netcdfs_cesm", _iter)
+
+    ds = load.vars(h0, ["TSA", "QSOIL"], year=2000)
+
+    # every history file is read once
+    assert len(opened) == 12
+
+    xr.testing.assert_identical(ds.TSA, load.var(h0, "TSA", year=2000).TSA)
+    xr.testing.assert_identical(ds.QSOIL, load.var(h0, "QSOIL", year=2000).QSOIL)
+
+    # only the missing variable is saved
+    opened.clear()
+    mtimes = _mtimes([load._destfile_name(h0, ["TSA"], 2000)])
+    load.vars(h0, ["TSA", "QVEGE"], year=2000)
+
+    assert len(opened) == 12
+    assert _mtimes([load._destfile_name(h0, ["TSA"], 2000)]) == mtimes
+    assert os.path.isfile(load._destfile_name(h0, ["QVEGE"], 2000))
+
+
+def test_var_encoding(h0):
+
+    expected = load.var(h0, "TSA", year=2000)
+
+    ds = load.var(h0, "QSOIL", year=2000, encoding="float32")
+    fN = load._destfile_name(h0, ["QSOIL"], 2000)
+
+    with xr.open_dataset(fN) as saved:
+        encoding = saved.QSOIL.encoding
+
+    assert encoding["zlib"]
+    assert encoding["shuffle"]
+    assert encoding["dtype"] == np.float32
+    # all time steps in one chunk, lat (4) and lon (8) are smaller than the tile
+    assert encoding["chunksizes"] == (12, 4, 8)
+
+    assert ds.QSOIL.dtype == np.float32
+    assert ds.time.identical(expected.time)
+
+
+def test_var_encoding_map(h0):
+
+    load.var(h0, "TSA", year=2000, encoding=dict(zlib=True, chunks="map"))
+    fN = load._destfile_name(h0, ["TSA"], 2000)
+
+    with xr.open_dataset(fN) as saved:
+        assert saved.TSA.encoding["chunksizes"] == (1, 4, 8)
+        assert saved.TSA.dtype == np.float64
+
+
+def test_var_encoding_default_keeps_source(h0):
+
+    # compressed float32 history files with missing values
+    enc = dict(zlib=True, dtype="float32", _FillValue=1e36, missing_value=1e36)
+    for fN in h0.sel(year=2000):
+        ds = xr.load_dataset(fN)
+        ds.to_netcdf(fN, format="NETCDF4_CLASSIC", encoding={"TSA": enc})
+
+    load.var(h0, "TSA", year=2000)
+    fN = load._destfile_name(h0, ["TSA"], 2000)
+
+    with xr.open_dataset(fN) as saved:
+        encoding = saved.TSA.encoding
+
+    assert encoding["zlib"]
+    assert encoding["dtype"] == np.float32
+    assert encoding["_FillValue"] == np.float32(1e36)
+    assert encoding["missing_value"] == np.float32(1e36)
+
+    # a policy only changes what it sets
+    load._postprocess(h0, "TSA", year=2000, force_save=True, encoding="none")
+
+    with xr.open_dataset(fN) as saved:
+        encoding = saved.TSA.encoding
+
+    assert not encoding["zlib"]
+    assert encoding["dtype"] == np.float32
+    assert encoding["missing_value"] == np.float32(1e36)
+
+
+def test_var_encoding_invalid(h0):
+
+    with pytest.raises(KeyError, match="encoding"):
+        load.var(h0, "TSA", year=2000, encoding="unknown")
+
+
+@pytest.mark.lnd_case(years=range(2000, 2004))
+def test_consolidate(h0):
+
+    expected = load.var(h0, "TSA", year=None)
+
+    fNs = load.consolidate(h0, "TSA", years_per_file=2)
+
+    assert [os.path.basename(fN).split(".")[-2] for fN in fNs] == [
+        "2000-2001",
+        "2002-2003",
+    ]
+
+    # nothing to do
+    mtimes = _mtimes(fNs)
+    load.consolidate(h0, "TSA", years_per_file=2)
+    assert _mtimes(fNs) == mtimes
+
+    # var prefers the consolidated files
+    assert load._consolidated_files(h0, ["TSA"], [2001, 2002]) == fNs
+    assert load._consolidated_files(h0, ["QSOIL"], [2001, 2002]) is None
+
+    xr.testing.assert_identical(load.var(h0, "TSA", year=None), expected)
+    result = load.var(h0, "TSA", year=slice(2001, 2002))
+    xr.testing.assert_identical(result, expected.sel(time=slice("2001", "2002")))
+
+    # yearly files that were removed are fine
+    os.remove(load._destfile_name(h0, ["TSA"], 2000))
+    assert load._consolidated_files(h0, ["TSA"], [2000]) == fNs[:1]
+
+
+@pytest.mark.lnd_case(years=range(2000, 2004))
+def test_consolidate_stale(h0):
+
+    load.var(h0, "TSA", year=None)
+    fNs = load.consolidate(h0, "TSA", years_per_file=None)
+
+    assert len(fNs) == 1
+    assert load._consolidated_files(h0, ["TSA"], [2000, 2003]) == fNs
+
+    # a yearly file changed
+    load._postprocess(h0, "TSA", year=2003, force_save=True)
+    os.utime(load._destfile_name(h0, ["TSA"], 2003), ns=(0, 0))
+    assert load._consolidated_files(h0, ["TSA"], [2000, 2003]) is None
+
+    # smaller blocks replace the file with all years
+    fNs_new = load.consolidate(h0, "TSA", years_per_file=2)
+    assert len(fNs_new) == 2
+    assert not os.path.isfile(fNs[0])
+    assert load._consolidated_files(h0, ["TSA"], [2000, 2003]) == fNs_new
+
+
+def test_consolidate_missing(h0):
+
+    with pytest.raises(RuntimeError, match="missing"):
+        load.consolidate(h0, "TSA")
@@ -0,0 +1,251 @@
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from cesm._load import regions
+from cesm.utils import xarray_utils as xu
+
+pytestmark = pytest.mark.lnd_case(years=(2000, 2001), nlat=9, nlon=12)
+
+
+@pytest.fixture
+def field():
+
+    rng = np.random.default_rng(0)
+
+    lat = np.linspace(-80, 80, 9)
+    lon = np.arange(12) * 30.0
+
+    data = rng.normal(size=(3, lat.size, lon.size))
+    data[0, 2, 3] = np.nan
+
+    return xr.DataArray(
+        data,
+        dims=("time", "lat", "lon"),
+        coords={"time": [1, 2, 3], "lat": lat, "lon": lon},
+        name="TSA",
+    )
+
+
+def _mask_weight(field):
+
+    mask = xr.full_like(field.isel(time=0), np.nan).drop_vars("time")
+    mask[:4, :6] = 3
+    mask[4:, :] = 1
+    # region 2 is empty
+
+    weight = np.cos(np.deg2rad(field.lat)) * xr.ones_like(mask)
+
+    return mask, weight
+
+
+def test_weight_matrix(field):
+
+    mask, weight = _mask_weight(field)
+
+    matrix = regions._weight_matrix(mask, weight, [1, 2, 3])
+
+    assert matrix.shape == (3, mask.size)
+    assert matrix[1].nnz == 0
+
+    expected = np.where(mask.values.ravel() == 3, weight.values.ravel(), 0)
+    np.testing.assert_allclose(matrix[2].toarray().ravel(), expected)
+
+
+def test_regional_mean(field):
+
+    mask, weight = _mask_weight(field)
+    matrix = regions._weight_matrix(mask, weight, [1, 2, 3])
+
+    result = regions._regional_mean(field, matrix, dim="srex")
+
+    assert result.dims == ("time", "srex")
+    assert result.name == "TSA"
+
+    for i, number in enumerate([1, 3]):
+        expected = field.where(mask == number).weighted(weight).mean(("lat", "lon"))
+        np.testing.assert_allclose(result.isel(srex=i * 2), expected)
+
+    # empty region
+    assert result.isel(srex=1).isnull().all()
+
+
+def test_regional_mean_wrong_grid(field):
+
+    mask, weight = _mask_weight(field)
+    matrix = regions._weight_matrix(mask, weight, [1, 2, 3])
+
+    with pytest.raises(ValueError, match="grid"):
+        regions._regional_mean(field.isel(lat=slice(1, None)), matrix)
+
+
+def test_cached_weights(tmp_path, field):
+
+    mask, weight = _mask_weight(field)
+    fN = str(tmp_path / "weights.test.npz")
+
+    calls = []
+
+    def compute():
+        calls.append(None)
+        return regions._weight_matrix(mask, weight, [1, 2, 3])
+
+    first = regions._cached_weights(fN, compute)
+    second = regions._cached_weights(fN, compute)
+
+    assert os.path.isfile(fN)
+    assert len(calls) == 1
+    assert (first != second).nnz == 0
+
+
+def test_grid_hash(field):
+
+    lat, lon = field.lat, field.lon
+
+    assert regions._grid_hash(lat, lon) == regions._grid_hash(lat.values, lon)
+    assert regions._grid_hash(lat, lon) != regions._grid_hash(lat + 1, lon)
+
+
+@pytest.mark.lnd_case(years=(2000,), nlat=36, nlon=72)
+def test_srex_weights(h0, tmp_path):
+
+    regionmask = pytest.importorskip("regionmask")
+
+    matrix = regions._srex_weights(h0)
+
+    srex = regionmask.defined_regions.srex
+    assert matrix.shape == (len(srex.numbers), 36 * 72)
+    assert len(list(tmp_path.rglob("weights.srex.*.npz"))) == 1
+
+    ds = xu.open_cesm(h0.sel(year=2000)[0])
+
+    landfrac = h0.data.landfrac
+    wgt = landfrac * h0.data.weight
+    mask = srex.mask(landfrac, wrap_lon=True)
+
+    result = regions._regional_mean(ds.TSA, matrix)
+
+    for i, number in enumerate(srex.numbers):
+        expected = ds.TSA.where(mask == number).weighted(wgt).mean(("lat", "lon"))
+        np.testing.assert_allclose(result.isel(region=i), expected)
+
+
+def _mask_file(h0, folder, **attrs):
+
+    landfrac = h0.data.landfrac
+
+    mask = xr.full_like(landfrac, np.nan).rename("mask")
+    mask[:4, :6] = 3
+    mask[4:, :] = 1
+    mask.attrs = attrs
+
+    fN = os.path.join(folder, "test_mask.nc")
+    mask.to_netcdf(fN)
+
+    return fN, mask
+
+
+def test_var_regions_mask_file(h0, tmp_path):
+
+    from cesm._load import load
+
+    fN, mask = _mask_file(h0, str(tmp_path))
+
+    ds = load.var_regions(h0, "TSA", year=None, regions=fN, weighting="area")
+
+    assert ds.TSA.dims == ("time", "region")
+    assert ds.sizes["time"] == 24
+    np.testing.assert_equal(ds.region.values, [1, 3])
+    np.testing.assert_equal(ds.abbrevs.values, ["1", "3"])
+
+    tsa = xu.read_netcdfs_cesm(h0.sel(), "time").TSA
+
+    for number in [1, 3]:
+        expected = tsa.where(mask == number).weighted(h0.data.area).mean(("lat", "lon"))
+        np.testing.assert_allclose(ds.TSA.sel(region=number), expected)
+
+    # the weights are computed once
+    assert len(list(tmp_path.rglob("weights.test_mask.area.*.npz"))) == 1
+
+
+def test_var_regions_flag_meanings(h0, tmp_path):
+
+    from cesm._load import load
+
+    fN, _ = _mask_file(
+        h0, str(tmp_path), flag_values=[1, 2, 3], flag_meanings="south empty north"
+    )
+
+    ds = load.var_regions(h0, "TSA", year=2000, regions=fN, name="hemispheres")
+
+    np.testing.assert_equal(ds.region.values, [1, 2, 3])
+    np.testing.assert_equal(ds.abbrevs.values, ["south", "empty", "north"])
+    assert ds.TSA.sel(region=2).isnull().all()
+
+    assert list(tmp_path.rglob("regions/hemispheres/coslat_landfrac/*.2000.nc"))
+
+
+def test_var_regions_regionmask(h0):
+
+    from cesm._load import load
+
+    regionmask = pytest.importorskip("regionmask")
+
+    poly = [[0, -90], [0, 90], [180, 90], [180, -90]]
+    regions = regionmask.Regions([poly], numbers=[5], abbrevs=["E"], name="east")
+
+    ds = load.var_regions(h0, "TSA", year=2000, regions=regions, weighting="coslat")
+
+    tsa = xu.read_netcdfs_cesm(h0.sel(year=2000), "time").TSA
+    mask = regions.mask(h0.data.lon, h0.data.lat)
+    expected = tsa.where(mask == 5).weighted(h0.data.weight).mean(("lat", "lon"))
+
+    np.testing.assert_equal(ds.abbrevs.values, ["E"])
+    np.testing.assert_allclose(ds.TSA.sel(region=5), expected)
+
+
+def test_var_regions_errors(h0, tmp_path):
+
+    from cesm._load import load
+
+    fN, _ = _mask_file(h0, str(tmp_path))
+
+    with pytest.raises(ValueError, match="weighting"):
+        load.var_regions(h0, "TSA", year=2000, regions=fN, weighting="land")
+
+    # mask on another grid
+    xr.open_dataset(fN).isel(lat=slice(1, None)).to_netcdf(tmp_path / "wrong.nc")
+
+    with pytest.raises(ValueError, match="grid"):
+        load.var_regions(h0, "TSA", year=2000, regions=str(tmp_path / "wrong.nc"))
+
+
+@pytest.mark.lnd_case(years=(2000,), nlat=36, nlon=72)
+def test_var_SREX_LAND(h0):
+
+    from cesm._load import load
+
+    regionmask = pytest.importorskip("regionmask")
+
+    ds = load.var_SREX_LAND(h0, "TSA", year=2000)
+
+    np.testing.assert_equal(ds.srex.values, np.arange(-2, 27))
+    assert ds.srex_abbrev.values[2] == "global_land_wo_antarctica"
+    assert ds.srex_abbrev.values[3] == "ALA"
+
+    tsa = xu.read_netcdfs_cesm(h0.sel(year=2000), "time").TSA
+    weight = h0.data.weight
+    wgt = h0.data.landfrac * weight
+    mask = regionmask.defined_regions.srex.mask(h0.data.landfrac, wrap_lon=True)
+
+    expected = [
+        tsa.weighted(weight).mean(("lat", "lon")),
+        tsa.weighted(wgt).mean(("lat", "lon")),
+        tsa.sel(lat=slice(-60, 87)).weighted(wgt).mean(("lat", "lon")),
+        tsa.where(mask == 1).weighted(wgt).mean(("lat", "lon")),
+    ]
+
+    for i, exp in enumerate(expected):
+        np.testing.assert_allclose(ds.TSA.isel(srex=i), exp)
@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from cesm._load import load, soil
+from cesm.utils import xarray_utils as xu
+
+
+def test_soillev(h0, tmp_path):
+
+    ds = load.soillev(h0, "SOILLIQ", year=2000)
+
+    # the previous implementation
+    da = xu.read_netcdfs_cesm(h0.sel(), "time").SOILLIQ
+    da = da.assign_coords(soillev=("levgrnd", pd.cut(da.levgrnd, [0, 0.1, 1, 2.9])))
+    expected = da.groupby("soillev").sum(dim="levgrnd", skipna=False)
+
+    assert ds.SOILLIQ.dims == ("time", "soillev", "lat", "lon")
+    np.testing.assert_equal(ds.soillev.values, ["(0, 0.1]", "(0.1, 1]", "(1, 2.9]"])
+
+    np.testing.assert_allclose(
+        ds.SOILLIQ.isel(soillev=slice(0, 2)),
+        expected.transpose(*ds.SOILLIQ.dims).isel(soillev=slice(0, 2)),
+    )
+
+    # no level below 1 m
+    assert (ds.SOILLIQ.isel(soillev=2) == 0).all()
+
+    # files saved with the previous implementation are computed again
+    (fN,) = tmp_path.rglob("*.provenance.json")
+    assert json.loads(fN.read_text())["transform_version"] == 1
+
+
+def test_soil_weights_DZSOI(h0):
+
+    weights = soil._soil_weights(h0.data, [0, 0.05, 0.3], "DZSOI")
+
+    dz = np.array([0.0175, 0.0276, 0.0455, 0.0750, 0.1236, 0.2038, 0.3360])
+    interfaces = np.concatenate([[0], np.cumsum(dz)])
+
+    # (0, 0.05]: the first two levels and part of the third
+    expected = np.zeros(7)
+    expected[:2] = dz[:2]
+    expected[2] = 0.05 - interfaces[2]
+
+    np.testing.assert_allclose(weights.isel(soillev=0), expected / 0.05)
+    np.testing.assert_allclose(weights.sum("levgrnd"), 1)
+    np.testing.assert_equal(weights.soillev_bottom.values, [0.05, 0.3])
+
+
+def test_soil_layers(h0):
+
+    bounds = [0, 0.05, 0.3]
+
+    ds = load.soil_layers(h0, "SOILLIQ", year=2000, bounds=bounds)
+
+    weights = soil._soil_weights(h0.data, bounds, "DZSOI")
+    da = xu.read_netcdfs_cesm(h0.sel(), "time").SOILLIQ
+
+    expected = (da * weights).sum("levgrnd").transpose(*ds.SOILLIQ.dims)
+
+    np.testing.assert_allclose(ds.SOILLIQ, expected)
+
+
+def test_soil_layers_nan():
+
+    weights = xr.DataArray(
+        [[0.5, 0.5, 0, 0], [0, 0, 0.5, 0.5]],
+        dims=("soillev", "levgrnd"),
+        coords={"soillev": ["a", "b"]},
+    )
+    da = xr.DataArray([[1.0, 2.0, 3.0, np.nan, 5.0]], dims=("lat", "levgrnd"))
+
+    result = soil._soil_layers(da, weights)
+
+    assert result.dims == ("lat", "soillev")
+    np.testing.assert_equal(result.values, [[1.5, np.nan]])
+
+
+def test_soil_weights_errors(h0):
+
+    with pytest.raises(ValueError, match="weighting"):
+        soil._soil_weights(h0.data, [0, 1], "mean")
+
+    with pytest.raises(ValueError, match="bounds"):
+        soil._soil_weights(h0.data, [1, 0], "DZSOI")
@@ -0,0 +1,69 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+from synthetic import create_lnd_case, name
+
+from cesm.utils import xarray_utils as xu
+
+
+@pytest.fixture(scope="module")
+def files(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("xarray_utils"))
+    create_lnd_case(folder, years=(2000,))
+    return sorted(glob.glob(os.path.join(folder, name, "lnd", "hist", "*.nc")))
+
+
+def test_iter_netcdfs_cesm(files):
+
+    expected = xu.read_netcdfs_cesm(files, "time")
+
+    datasets = list(xu.iter_netcdfs_cesm(files, lambda ds: ds.TSA))
+
+    assert len(datasets) == 12
+    xr.testing.assert_identical(xr.concat(datasets, "time"), expected.TSA)
+
+
+def test_reduce_netcdfs_cesm(files):
+
+    def transform(ds):
+        # add some NaN
+        return ds.TSA.where(ds.TSA > 280)
+
+    da = xu.read_netcdfs_cesm(files, "time", transform)
+    result = xu.reduce_netcdfs_cesm(files, "time", transform)
+
+    np.testing.assert_equal(result.stat.values, ["sum", "count", "min", "max", "mean"])
+
+    xr.testing.assert_allclose(result.sel(stat="sum", drop=True), da.sum("time"))
+    xr.testing.assert_allclose(result.sel(stat="min", drop=True), da.min("time"))
+    xr.testing.assert_allclose(result.sel(stat="max", drop=True), da.max("time"))
+    xr.testing.assert_allclose(result.sel(stat="mean", drop=True), da.mean("time"))
+    np.testing.assert_equal(result.sel(stat="count").values, da.count("time").values)
+
+
+def test_open_cesm_variables(files):
+
+    expected = xu.open_cesm(files[0])
+
+    ds = xu.open_cesm(files[0], variables=["TSA", "QSOIL"])
+
+    assert set(ds.data_vars) == {"TSA", "QSOIL", "time_bounds"}
+    xr.testing.assert_identical(ds.TSA, expected.TSA)
+    xr.testing.assert_identical(ds.time, expected.time)
+
+    # a single variable
+    ds = xu.open_cesm(files[0], variables="landfrac")
+    xr.testing.assert_identical(ds.landfrac, expected.landfrac)
+
+
+def test_read_netcdfs_cesm_variables(files):
+
+    expected = xu.read_netcdfs_cesm(files, "time", lambda ds: ds.SOILLIQ)
+    result = xu.read_netcdfs_cesm(
+        files, "time", lambda ds: ds.SOILLIQ, variables=["SOILLIQ"]
+    )
+
+    xr.testing.assert_identical(result, expected)
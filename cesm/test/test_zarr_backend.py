@@ -0,0 +1,123 @@
+import os
+
+import pytest
+import xarray as xr
+from synthetic import create_lnd_case
+
+import cesm
+from cesm._load import load
+
+zarr = pytest.importorskip("zarr")
+
+from cesm._load.zarr_backend import (  # noqa: E402
+    _postprocess_zarr,
+    _read_store_attrs,
+    _store_name,
+)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    return str(tmp_path)
+
+
+def test_var_zarr(folder):
+
+    yaml_str = create_lnd_case(folder, years=(2000, 2001))
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+    ds = load.var(h0, "TSA", year=None, backend="zarr")
+    expected = load.var(h0, "TSA", year=None)
+
+    # lazy
+    assert ds.TSA.chunks is not None
+    xr.testing.assert_allclose(ds.TSA.load(), expected.TSA)
+
+    regions, provenance, slot, _ = _read_store_attrs(_store_name(h0, ["TSA"]))
+
+    assert regions == {2000: (0, 12, 12), 2001: (12, 24, 12)}
+    assert slot == 12
+    assert provenance[2000]["varname"] == "TSA"
+
+    # select years
+    ds = load.var(h0, "TSA", year=2001, backend="zarr")
+    xr.testing.assert_allclose(ds.TSA.load(), expected.TSA.sel(time="2001"))
+
+
+def test_var_zarr_processes(folder):
+
+    yaml_str = create_lnd_case(folder, years=(2000, 2001, 2002))
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+    expected = load.var(h0, "TSA", year=None)
+
+    # create the store, then write two years in a process pool
+    load.var(h0, "TSA", year=2001, backend="zarr")
+    ds = load.var(h0, "TSA", year=None, backend="zarr", processes=2)
+
+    xr.testing.assert_allclose(ds.TSA.load(), expected.TSA)
+
+    regions, _, _, _ = _read_store_attrs(_store_name(h0, ["TSA"]))
+    assert regions[2001] == (0, 12, 12)
+
+
+def test_var_zarr_running_simulation(folder):
+
+    # the first year is not complete
+    yaml_str = create_lnd_case(folder, years=(2000,), months=range(1, 7))
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+    load.var(h0, "TSA", year=None, backend="zarr")
+
+    create_lnd_case(folder, years=(2000,), months=range(7, 13))
+    create_lnd_case(folder, years=(2001,))
+
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+    output = load._output("TSA")
+    store, years = _postprocess_zarr(h0, output, None, check_age=True)
+
+    # 2000 did not fit into its region anymore
+    regions, _, slot, _ = _read_store_attrs(store)
+    assert slot == 6
+    assert regions[2000] == (6, 18, 12)
+    assert regions[2001] == (18, 30, 12)
+
+    ds = load.var(h0, "TSA", year=None, backend="zarr")
+    expected = load.var(h0, "TSA", year=None)
+    xr.testing.assert_allclose(ds.TSA.load(), expected.TSA)
+
+
+def test_var_zarr_check_age(folder):
+
+    yaml_str = create_lnd_case(folder, years=(2000, 2001))
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+    output = load._output("TSA")
+
+    store, _ = _postprocess_zarr(h0, output, None)
+    _, provenance, _, _ = _read_store_attrs(store)
+
+    source_file = h0.sel(year=2001)[0]
+    stat = os.stat(source_file)
+    os.utime(source_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**10))
+
+    saved = []
+    _postprocess_zarr(
+        h0, output, None, check_age=True, callback=lambda y, e: saved.append(y)
+    )
+    assert saved == [2001]
+
+    _, result, _, _ = _read_store_attrs(store)
+    assert result[2000] == provenance[2000]
+    assert result[2001] != provenance[2001]
+
+
+def test_var_zarr_errors(folder):
+
+    yaml_str = create_lnd_case(folder, years=(2000,))
+    h0 = cesm.case("synthetic", cesm_cases_path=yaml_str).lnd.h0
+
+    with pytest.raises(ValueError, match="encoding"):
+        load.var(h0, "TSA", year=None, backend="zarr", encoding="zlib")
+
+    with pytest.raises(ValueError, match="backend"):
+        load.var(h0, "TSA", year=None, backend="hdf")
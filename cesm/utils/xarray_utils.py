@@ -1,9 +1,25 @@
+from functools import partial
 from glob import glob
 
 import numpy as np
-from xarray import concat, open_dataset
+from xarray import concat
+from xarray import decode_cf as decode_cf_dataset
+from xarray import open_dataset, open_mfdataset
 from xarray.coding.times import decode_cf_datetime
 
+# coordinates and bounds always read together with the requested variables
+_REQUIRED_VARIABLES = ("time", "time_bnds", "time_bounds", "lat", "lon")
+
+# keyword arguments of open_dataset that are passed to decode_cf if only a
+# subset of the variables is read
+_DECODE_KWARGS = (
+    "mask_and_scale",
+    "concat_characters",
+    "decode_coords",
+    "use_cftime",
+    "decode_timedelta",
+)
+
 
 def read_netcdfs(files, dim, transform_func=None, **kwargs):
     """read and combine multiple netcdf files
@@ -81,22 +97,207 @@ def read_netcdfs_cesm(files, dim, transform_func=None, **kwargs):
     http://xarray.pydata.org/en/stable/io.html#combining-multiple-files
     """
 
-    def process_one_path(path):
+    datasets = list(iter_netcdfs_cesm(files, transform_func, **kwargs))
+    combined = concat(datasets, dim)
+    return combined
 
-        with open_cesm(path, **kwargs) as ds:
-            if transform_func is not None:
-                ds = transform_func(ds)
-            ds.load()
-            return ds
+
+def iter_netcdfs_cesm(files, transform_func=None, **kwargs):
+    """read multiple netcdf files with open_cesm, one at a time
+
+    Parameters
+    ----------
+    files : string or list of files
+        path with wildchars or iterable of files
+    transform_func : function
+        function to apply for individual datasets
+    **kwargs : keyword arguments
+        passed to open_cesm
+
+    Yields
+    ------
+    ds : xarray Dataset
+        the loaded xarray Dataset of one file with transform_func applied
+
+    Examples
+    --------
+    for ds in iter_netcdfs_cesm('/path/*.nc'):
+        print(ds.time.values)
+    """
+
+    for p in _get_paths(files):
+        yield _process_one_path_cesm(p, transform_func, **kwargs)
+
+
+def _process_one_path_cesm(path, transform_func=None, **kwargs):
+    """open one file with open_cesm, transform and load it"""
+
+    with open_cesm(path, **kwargs) as ds:
+        if transform_func is not None:
+            ds = transform_func(ds)
+        ds.load()
+        return ds
+
+
+def _get_paths(files):
+    """expand a path with wildchars or return the list of files"""
 
     if isinstance(files, str):
-        paths = sorted(glob(files))
-    else:
-        paths = files
+        return sorted(glob(files))
 
-    datasets = [process_one_path(p) for p in paths]
-    combined = concat(datasets, dim)
-    return combined
+    return files
+
+
+def reduce_netcdfs_cesm(files, dim, transform_func=None, **kwargs):
+    """running sum, count, min, max and mean over multiple netcdf files
+
+    The files are read one at a time, so the memory does not depend on the
+    number of files.
+
+    Parameters
+    ----------
+    files : string or list of files
+        path with wildchars or iterable of files
+    dim : string
+        dimension to reduce, must exist in every file (e.g. time)
+    transform_func : function
+        function to apply for individual datasets, see example
+    **kwargs : keyword arguments
+        passed to open_cesm
+
+    Returns
+    -------
+    reduced : xarray Dataset or DataArray
+        the statistics along the new dimension 'stat' (with the
+        coordinates 'sum', 'count', 'min', 'max', 'mean'). NaN are
+        skipped.
+
+    Examples
+    --------
+    reduce_netcdfs_cesm('/path/*.nc', 'time', lambda ds: ds.TSA).sel(stat='mean')
+    """
+
+    datasets = iter_netcdfs_cesm(files, transform_func, **kwargs)
+
+    return _reduce_stats(datasets, dim)
+
+
+def _reduce_stats(datasets, dim):
+    """combine sum, count, min and max of an iterable of datasets"""
+
+    total, count, minimum, maximum = None, None, None, None
+
+    for ds in datasets:
+
+        if total is None:
+            total, count = ds.sum(dim), ds.count(dim)
+            minimum, maximum = ds.min(dim), ds.max(dim)
+        else:
+            total = total + ds.sum(dim)
+            count = count + ds.count(dim)
+            # fmin and fmax ignore NaN
+            minimum = np.fmin(minimum, ds.min(dim))
+            maximum = np.fmax(maximum, ds.max(dim))
+
+    if total is None:
+        raise ValueError("no files to reduce")
+
+    mean = total / count.where(count > 0)
+
+    stats = ["sum", "count", "min", "max", "mean"]
+    reduced = concat([total, count, minimum, maximum, mean], "stat")
+
+    return reduced.assign_coords(stat=stats)
+
+
+def open_mfcesm(
+    paths,
+    *,
+    varnames=None,
+    chunks=None,
+    round_latlon=4,
+    interpolate_time=True,
+    **kwargs,
+):
+    """Lazily open multiple CESM history files as a single dask-backed dataset.
+
+    Every file is decoded like with open_cesm (time interpolation and
+    rounding of lat and lon). The data is only read when it is computed, so
+    long time series can be reduced without loading all of them.
+
+    Parameters
+    ----------
+    paths : string or list of files
+        Path with wildchars or list of files, concatenated along time.
+    varnames : list of str, optional
+        Only keep these variables. Default: all variables.
+    chunks : int or dict, optional
+        Dictionary with keys given by dimension names and values given by
+        chunk sizes. By default every file is one chunk.
+    round_latlon, interpolate_time
+        See open_cesm.
+    **kwargs: mapping
+        Keyword arguments passed on to xr.open_mfdataset
+
+    Returns
+    -------
+    dataset : Dataset
+        The combined, dask-backed dataset.
+
+    See Also
+    --------
+    open_cesm
+    """
+
+    decode_cf = kwargs.pop("decode_cf", None)
+    decode_times = kwargs.pop("decode_times", None)
+
+    preprocess = partial(
+        _decode_cesm,
+        variables=varnames,
+        round_latlon=round_latlon,
+        interpolate_time=interpolate_time,
+        decode_cf=decode_cf,
+        decode_times=decode_times,
+    )
+
+    # only concatenate variables with a time dimension, take the others
+    # from the first file
+    kwargs.setdefault("data_vars", "minimal")
+    kwargs.setdefault("coords", "minimal")
+    kwargs.setdefault("compat", "override")
+
+    ds = open_mfdataset(
+        paths,
+        chunks=chunks,
+        concat_dim="time",
+        combine="nested",
+        preprocess=preprocess,
+        # only decode the selected variables, see _decode_cesm
+        decode_cf=decode_cf if varnames is None else False,
+        decode_times=False,
+        **kwargs,
+    )
+
+    # the chunks passed to open_mfdataset apply to the individual files
+    if chunks is not None:
+        ds = ds.chunk(chunks)
+
+    return ds
+
+
+def _select_variables(ds, variables):
+    """subset to variables and the coordinates and bounds required to decode"""
+
+    if isinstance(variables, str):
+        variables = [variables]
+
+    required = [v for v in _REQUIRED_VARIABLES if v in ds.variables]
+
+    # keep the order and avoid duplicates
+    keep = list(dict.fromkeys(list(variables) + required))
+
+    return ds[keep]
 
 
 def _wrap360(self, lon="lon"):
@@ -163,6 +364,7 @@ def _cos_wgt(self, lat="lat"):
 def open_cesm(
     filename_or_obj,
     *,
+    variables=None,
     round_latlon=4,
     interpolate_time=True,
     **kwargs,
@@ -176,6 +378,10 @@ def open_cesm(
         ends with .gz, in which case the file is gunzipped and opened with
         scipy.io.netcdf (only netCDF3 supported). Byte-strings or file-like
         objects are opened by scipy.io.netcdf (netCDF3) or h5py (netCDF4/HDF).
+    variables : str or list of str, optional
+        Only read and decode these variables (and time, time_bnds,
+        time_bounds, lat, lon). History files contain hundreds of variables,
+        so this is much faster if only few are needed. Default: all variables.
     round_latlon : int, default : True
         The latitude and longitude coordinates are rounded to this number of
         decimals. This is done because there are very small numerical differences
@@ -201,14 +407,73 @@ def open_cesm(
     decode_cf = kwargs.pop("decode_cf", None)
     decode_times = kwargs.pop("decode_times", None)
 
-    # always open with decode_times = False
-    ds = open_dataset(
-        filename_or_obj,
+    if variables is None:
+        decode_kwargs = None
+
+        # always open with decode_times = False
+        ds = open_dataset(
+            filename_or_obj,
+            decode_cf=decode_cf,
+            decode_times=False,
+            **kwargs,
+        )
+    else:
+        decode_kwargs = {
+            key: kwargs.pop(key) for key in _DECODE_KWARGS if key in kwargs
+        }
+
+        # only decode the selected variables, see _decode_cesm
+        ds = open_dataset(filename_or_obj, decode_cf=False, **kwargs)
+
+    return _decode_cesm(
+        ds,
+        variables=variables,
+        decode_kwargs=decode_kwargs,
+        round_latlon=round_latlon,
+        interpolate_time=interpolate_time,
         decode_cf=decode_cf,
-        decode_times=False,
-        **kwargs,
+        decode_times=decode_times,
     )
 
+
+def _decode_cesm(
+    ds,
+    variables=None,
+    decode_kwargs=None,
+    round_latlon=4,
+    interpolate_time=True,
+    decode_cf=None,
+    decode_times=None,
+):
+    """CESM specific decoding of a dataset opened with decode_times=False
+
+    Parameters
+    ----------
+    ds : Dataset
+        Dataset opened with decode_times=False or, if variables is given,
+        with decode_cf=False.
+    variables : str or list of str, optional
+        Only keep these variables (and the required coordinates and bounds)
+        and decode them with decode_cf.
+    decode_kwargs : dict, optional
+        Keyword arguments passed to decode_cf if variables is given.
+    round_latlon, interpolate_time
+        See open_cesm.
+    decode_cf, decode_times : bool or None
+        As passed to open_cesm. The time is only decoded if neither is False.
+
+    Returns
+    -------
+    dataset : Dataset
+        The decoded dataset.
+    """
+
+    if variables is not None:
+        ds = _select_variables(ds, variables)
+
+        if decode_cf is not False:
+            ds = decode_cf_dataset(ds, decode_times=False, **(decode_kwargs or {}))
+
     time_name = "time"
     units = ds.coords[time_name].units
     calendar = ds.coords[time_name].calendar
@@ -231,8 +496,9 @@ def open_cesm(
         ds = ds.assign_coords({time_name: time})
 
     if round_latlon:
-        lon_name, lat_name = "lon", "lat"
-        ds.coords[lon_name] = np.round(ds[lon_name], round_latlon)
-        ds.coords[lat_name] = np.round(ds[lat_name], round_latlon)
+        # e.g. regional means have no lat and lon
+        for name in ("lon", "lat"):
+            if name in ds.variables:
+                ds.coords[name] = np.round(ds[name], round_latlon)
 
     return ds